@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# The adaptation effect computations of conll2019_analyses.Rmd, over the whole grid of models and lists
+# at once: sentence surprisal from the word surprisal (load_data.Rmd), the join of pre and post,
+# diff = pre_surp - post_surp, the correction of diff for pre_surp (corrected_diff) and the summaries
+# (data_summary). Groups are integer codes and every group-by is a np.bincount, so nothing loops over
+# models or lists.
+#
+# Typical use, with the dataset made by load_surprisal.py:
+#   pre = sentence_surprisal(load_surprisal.load(out, 'pre').to_pandas(), 'pre')
+#   post = sentence_surprisal(load_surprisal.load(out, 'post').to_pandas(), 'post')
+#   all20 = adaptation_effects(pre, post, amt=20)
+#   summarise(all20, 'corrected_diff', ['adapt', 'test', 'nhid', 'csize'])
+
+strucs = ['orc', 'orrc', 'prc', 'prrc', 'src', 'ocont', 'scont']
+rcs = ['orc', 'orrc', 'prc', 'prrc', 'src']
+
+# columns that identify a model and list, whichever of them a table has
+model_keys = ['csize', 'clist', 'nhid', 'amt', 'seed', 'adaptlist']
+
+
+# One int64 code per row for the combination of cols. Columns are factorized together over all the
+# frames, so equal keys get equal codes in every frame.
+def key_codes(frames, cols):
+    codes = [np.zeros(len(df), dtype=np.int64) for df in frames]
+    for col in cols:
+        values = pd.concat([df[col].astype(object) for df in frames], ignore_index=True)
+        col_codes, uniques = pd.factorize(values)
+        start = 0
+        for i, df in enumerate(frames):
+            codes[i] = codes[i] * (len(uniques) + 1) + col_codes[start:start+len(df)]
+            start += len(df)
+    return(codes)
+
+
+# group number of every row, and the first row of every group
+def group_index(df, cols):
+    code, = key_codes([df], cols)
+    _, first, gid = np.unique(code, return_index=True, return_inverse=True)
+    return(gid.ravel(), first)
+
+
+def group_mean(values, gid, ngroups):
+    n = np.bincount(gid, minlength=ngroups)
+    return(np.bincount(gid, weights=values, minlength=ngroups) / np.maximum(n, 1), n)
+
+
+# Mean surprisal of every sentence (the data_summary of load_data.Rmd), leaving out <unk> by default
+def sentence_surprisal(words, kind, exclude_unk=True):
+    if exclude_unk:
+        words = words[words['word'].astype(str) != '<unk>']
+    cols = ['sentid'] + [c for c in model_keys + ['adapt'] if c in words.columns] + ['%s_test'%(kind)]
+    gid, first = group_index(words, cols)
+    var = '%s_surp'%(kind)
+    mean, n = group_mean(words[var].to_numpy(dtype=np.float64), gid, len(first))
+    out = words.iloc[first][cols].reset_index(drop=True)
+    for col in cols:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(out[col].cat.categories.dtype)
+    out[var] = mean
+    out['N'] = n
+    return(out.rename(columns={'%s_test'%(kind): 'test'}))
+
+
+# Inner join of post and pre on keys: every post row gets the pre_surp of the same sentence, model
+# and list, looked up in a hash index over the key codes of pre (one row per key, as data_summary makes).
+def join(pre, post, keys):
+    pre_code, post_code = key_codes([pre, post], keys)
+    rows = pd.Index(pre_code).get_indexer(post_code)
+    found = rows >= 0
+    out = post[found].reset_index(drop=True)
+    out['pre_surp'] = pre['pre_surp'].to_numpy()[rows[found]]
+    return(out)
+
+
+# diff regressed on centered pre_surp, in every group of by (one regression over everything if by is
+# empty, as in the Rmd). Adds diff and corrected_diff = residual + intercept, and returns the intercept
+# and slope of every group.
+def correct(df, by=[]):
+    x = df['pre_surp'].to_numpy(dtype=np.float64)
+    y = (df['pre_surp'] - df['post_surp']).to_numpy(dtype=np.float64)
+    if by:
+        gid, first = group_index(df, by)
+    else:
+        gid, first = np.zeros(len(df), dtype=np.int64), np.zeros(1, dtype=np.int64)
+    ngroups = len(first)
+    xm, n = group_mean(x, gid, ngroups)
+    ym, _ = group_mean(y, gid, ngroups)
+    dx = x - xm[gid]
+    sxy = np.bincount(gid, weights=dx * (y - ym[gid]), minlength=ngroups)
+    sxx = np.bincount(gid, weights=dx * dx, minlength=ngroups)
+    slope = sxy / sxx
+    df['diff'] = y
+    df['corrected_diff'] = y - slope[gid] * dx
+
+    coefs = df.iloc[first][by].reset_index(drop=True) if by else pd.DataFrame(index=[0])
+    coefs['intercept'] = ym
+    coefs['slope'] = slope
+    coefs['N'] = n
+    return(coefs)
+
+
+# The variables conll2019_analyses.Rmd adds for its analyses
+def add_variables(df):
+    df['test'] = pd.Categorical(df['test'], categories=strucs)
+    df['adapt'] = pd.Categorical(df['adapt'], categories=strucs[::-1])
+    df['diagonal'] = np.where(df['adapt'] == df['test'], 'diagonal', 'not-diagonal')
+    df['testRC'] = pd.Categorical(np.where(df['test'].isin(rcs), 'Test on RCs', 'Test on coordination'), categories=['Test on RCs', 'Test on coordination'])
+    df['adaptRC'] = pd.Categorical(np.where(df['adapt'].isin(rcs), 'Adapted to RCs', 'Adapted to coordination'), categories=['Adapted to RCs', 'Adapted to coordination'])
+    return(df)
+
+
+# Pre and post sentence surprisal (see sentence_surprisal) -> one row per post sentence with diff and
+# corrected_diff. amt picks the amount of adaptation for the trained models (20 in the paper).
+def adaptation_effects(pre, post, amt=None, by=[]):
+    if amt is not None:
+        pre = pre[pre['amt'] == amt]
+        post = post[post['amt'] == amt]
+    keys = ['sentid'] + [c for c in model_keys if c in pre.columns and c in post.columns] + ['test']
+    df = join(pre.drop(columns=['N']), post.drop(columns=['N']), keys)
+    correct(df, by)
+    return(add_variables(df))
+
+
+# data_summary: N, mean, sd, se and 95% ci of var in every group
+def summarise(df, var, by):
+    gid, first = group_index(df, by)
+    ngroups = len(first)
+    values = df[var].to_numpy(dtype=np.float64)
+    mean, n = group_mean(values, gid, ngroups)
+    ss = np.bincount(gid, weights=(values - mean[gid])**2, minlength=ngroups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sd = np.sqrt(ss / (n - 1))
+        se = sd / np.sqrt(n)
+        ci = se * stats.t.ppf(0.95/2 + .5, n - 1)
+    out = df.iloc[first][by].reset_index(drop=True)
+    out['N'] = n
+    out[var] = mean
+    out['sd'] = sd
+    out['se'] = se
+    out['ci'] = ci
+    return(out.sort_values(by).reset_index(drop=True))
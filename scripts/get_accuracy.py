@@ -1,24 +1,102 @@
+import os
+import re
+import glob
+import json
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-results_npi = []
-results_agr = []
+# Collects the agreement and NPI accuracies of every model in results_dir_base. Model directories are
+# found by glob (results_<nhid>_<corpus size>_<corpus variant>_0_<embedtype>), so new runs are picked up
+# without editing anything. Parsed files are cached by path and mtime in .acc_cache.json, so a re-run
+# only reads the files that are new or have changed. The models come in the order the original loops
+# went through them (corpus size, then nhid, then corpus variant), so the rows of all_acc.dat do too.
+#
+# Writes all_acc.dat (agreement, tab separated, as before) and all_acc.parquet and all_npi.parquet
+# with both tables in columnar form.
+
 embedtype = 'tied'
 results_dir_base = '../tied_accuracies'
-for corpus_size in ('2m','10m','20m'):
-    for nhid in (100,200,400,800,1600):
-        for corpus_var in "a b c d e".split():
-            results_dir = results_dir_base+'/results_'+str(nhid)+'_'+corpus_size+'_'+corpus_var+'_0_'+embedtype+'/rnn/full_sent/'
-            results_file = 'overall_accs.txt'
-            with open(results_dir+results_file,'r') as f:
-                for line in f:
-                    key,value = line.strip().split(': ')
-                    if 'npi' in key:
-                        results = results_npi
-                        key = ' ('.join(key.split('('))
-                    else:
-                        results = results_agr
-                    results.append([key,nhid,corpus_size,corpus_var,float(value)])
-results = results_agr
-resultsdf = pd.DataFrame(results,columns=('syntax','d_model','corpus_size','corpus_var','accuracy'))
-
-resultsdf.to_csv('../tied_accuracies/all_acc.dat', sep='\t')
\ No newline at end of file
+results_file = 'overall_accs.txt'
+cache_file = os.path.join(results_dir_base, '.acc_cache.json')
+workers = 16
+
+columns = ('syntax', 'd_model', 'corpus_size', 'corpus_var', 'accuracy')
+model_dir = re.compile(r'results_(\d+)_([^_/]+)_([^_/]+)_0_%s$'%(embedtype))
+size_units = {'k': 10**3, 'm': 10**6, 'b': 10**9}
+
+
+# 2m, 10m, 20m as numbers of words, so that 10m comes after 2m; sizes that are not like that go last
+def size_key(corpus_size):
+    m = re.match(r'^(\d+)([kmb]?)$', corpus_size)
+    if not m:
+        return((1, 0, corpus_size))
+    return((0, int(m.group(1)) * size_units.get(m.group(2), 1), corpus_size))
+
+
+def find_results():
+    paths = []
+    for d in sorted(glob.glob(os.path.join(results_dir_base, 'results_*_0_%s'%(embedtype)))):
+        m = model_dir.search(d)
+        path = os.path.join(d, 'rnn', 'full_sent', results_file)
+        if m and os.path.exists(path):
+            paths.append((path, int(m.group(1)), m.group(2), m.group(3)))
+    paths.sort(key=lambda r: (size_key(r[2]), r[1], r[3]))
+    return(paths)
+
+
+# rows of one overall_accs.txt: (agreement rows, npi rows)
+def read_results(path, nhid, corpus_size, corpus_var):
+    agr, npi = [], []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            key, value = line.strip().split(': ')
+            if 'npi' in key:
+                results = npi
+                key = ' ('.join(key.split('('))
+            else:
+                results = agr
+            results.append([key, nhid, corpus_size, corpus_var, float(value)])
+    return(agr, npi)
+
+
+def load_cache():
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            return(json.load(f))
+    return({})
+
+
+def save_cache(cache):
+    with open(cache_file + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    os.replace(cache_file + '.tmp', cache_file)
+
+
+def get_accuracies():
+    cache = load_cache()
+    found = find_results()
+
+    todo = [r for r in found if cache.get(r[0], {}).get('mtime') != os.path.getmtime(r[0])]
+    with ThreadPoolExecutor(workers) as pool:
+        parsed = list(pool.map(lambda r: read_results(*r), todo))
+    for (path, _, _, _), (agr, npi) in zip(todo, parsed):
+        cache[path] = dict(mtime=os.path.getmtime(path), agr=agr, npi=npi)
+
+    # forget models whose directories are gone
+    paths = set(r[0] for r in found)
+    cache = dict((path, entry) for path, entry in cache.items() if path in paths)
+    save_cache(cache)
+    print('%d models, %d read again'%(len(found), len(todo)))
+
+    results_agr = [row for path, _, _, _ in found for row in cache[path]['agr']]
+    results_npi = [row for path, _, _, _ in found for row in cache[path]['npi']]
+    return(pd.DataFrame(results_agr, columns=columns), pd.DataFrame(results_npi, columns=columns))
+
+
+if __name__ == '__main__':
+    agr_df, npi_df = get_accuracies()
+    agr_df.to_csv(os.path.join(results_dir_base, 'all_acc.dat'), sep='\t')
+    agr_df.to_parquet(os.path.join(results_dir_base, 'all_acc.parquet'))
+    npi_df.to_parquet(os.path.join(results_dir_base, 'all_npi.parquet'))
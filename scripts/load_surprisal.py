@@ -0,0 +1,165 @@
+import os
+import re
+import csv
+import sys
+import glob
+import multiprocessing
+import pandas as pd
+import pyarrow as pa
+
+# Python version of the loading part of load_data.Rmd. Reads every .pre and .post surprisal file of an
+# experiment in worker processes and streams them into one columnar dataset on disk, which is then
+# memory-mapped instead of read again.
+#
+# The dataset is a directory with one Arrow IPC file per partition (pre or post, and adapt list):
+#   <out>/pre/adaptlist=6.arrow, <out>/post/adaptlist=6.arrow, ...
+# and <out>/words.arrow, the vocabulary. Every row has the columns of the surprisal file (with surp,
+# entropy and entred renamed pre_surp, ... or post_surp, ... as in load_data.Rmd), plus the model and
+# list it comes from (csize, clist, nhid, amt or seed, adaptlist, adapt, pre_test/post_test). The word
+# column is stored as ids into words.arrow and these model/list columns as dictionaries, so strings are
+# only stored once. The files are added in path order whatever the number of workers, so the word ids
+# and the order of the rows are the same from one build to the next.
+
+# csize_clist_nhid.amt_testlist.adapt.test.post  OR  csize_clist_nhid.amt_testlist..test.pre
+trained_name = re.compile(r'^(?P<csize>\d+)m_(?P<clist>[^_]+)_(?P<nhid>\d+)\.(?P<amt>\d+)_(?P<adaptlist>\d+)\.(?P<adapt>[^.]*)\.(?P<test>[^.]+)\.(?P<kind>pre|post)$')
+# nhid.list.seed.adapt.test.post  OR  nhid.list.seed..test.pre
+untrained_name = re.compile(r'^(?P<nhid>\d+)\.(?P<adaptlist>\d+)\.(?P<seed>\d+)\.(?P<adapt>[^.]*)\.(?P<test>[^.]+)\.(?P<kind>pre|post)$')
+
+int_fields = ['csize', 'nhid', 'amt', 'adaptlist', 'seed']
+renamed = ['surp', 'entropy', 'entred']
+# the columns of a surprisal file (priming.header) after word, with their types
+value_types = [('sentid', pa.int64()), ('sentpos', pa.int64()), ('wlen', pa.int64()), ('surp', pa.float64()), ('entropy', pa.float64()), ('entred', pa.float64())]
+
+
+# metadata of a surprisal file from its name, None if it is not one
+def parse_name(path):
+    name = os.path.basename(path)
+    for pattern in [trained_name, untrained_name]:
+        m = pattern.match(name)
+        if m:
+            meta = m.groupdict()
+            for field in int_fields:
+                if field in meta:
+                    meta[field] = int(meta[field])
+            return(meta)
+    return(None)
+
+
+def find_files(fdir):
+    files = []
+    for path in sorted(glob.glob(os.path.join(fdir, '**', '*.pre'), recursive=True) + glob.glob(os.path.join(fdir, '**', '*.post'), recursive=True)):
+        meta = parse_name(path)
+        if meta is not None:
+            files.append((path, meta))
+    return(files)
+
+
+# one file as a data frame with the load_data.Rmd column names (without the metadata, which is constant)
+def read_file(task):
+    path, meta = task
+    df = pd.read_csv(path, sep=r'\s+', quoting=csv.QUOTE_NONE, keep_default_na=False, na_values=['NA'])
+    df = df.rename(columns=dict((col, '%s_%s'%(meta['kind'], col)) for col in renamed))
+    return(path, meta, df)
+
+
+def meta_fields(meta):
+    fields = [f for f in ['csize', 'clist', 'nhid', 'amt', 'seed', 'adaptlist'] if f in meta]
+    if meta['kind'] == 'post':
+        fields.append('adapt')
+    return(fields)
+
+
+class DatasetWriter(object):
+    def __init__(self, out, files):
+        self.out = out
+        self.words = {}
+        self.writers = {}
+        # every value of every metadata field is known from the file names, so the dictionaries are fixed
+        self.dictionaries = {}
+        for path, meta in files:
+            for field in meta_fields(meta) + ['test']:
+                self.dictionaries.setdefault(field, set()).add(meta[field])
+        for field in self.dictionaries:
+            self.dictionaries[field] = sorted(self.dictionaries[field])
+
+    def column(self, field, value, n):
+        values = self.dictionaries[field]
+        indices = pa.array([values.index(value)] * n, type=pa.int16())
+        return(pa.DictionaryArray.from_arrays(indices, pa.array(values, type=self.value_type(field))))
+
+    def value_type(self, field):
+        return(pa.int64() if field in int_fields else pa.string())
+
+    # The schema of the rows of a file, from its name only, so that a file whose columns pandas reads
+    # with other types (a file with only the header, say) is written with the same ones
+    def schema(self, meta):
+        fields = [pa.field('word', pa.int32())]
+        for col, value_type in value_types:
+            fields.append(pa.field('%s_%s'%(meta['kind'], col) if col in renamed else col, value_type))
+        for field in meta_fields(meta) + ['test']:
+            name = '%s_test'%(meta['kind']) if field == 'test' else field
+            fields.append(pa.field(name, pa.dictionary(pa.int16(), self.value_type(field))))
+        return(pa.schema(fields))
+
+    def add(self, meta, df):
+        words = self.words
+        word_ids = [words.setdefault(w, len(words)) for w in df['word'].astype(str)]
+        schema = self.schema(meta)
+        values = pa.schema([schema.field(i) for i in range(1, len(value_types) + 1)])
+        table = pa.Table.from_pandas(df[values.names], schema=values, preserve_index=False)
+        table = table.add_column(0, schema.field(0), pa.array(word_ids, type=pa.int32()))
+        n = len(df)
+        for field in meta_fields(meta):
+            table = table.append_column(field, self.column(field, meta[field], n))
+        table = table.append_column('%s_test'%(meta['kind']), self.column('test', meta['test'], n))
+        table = table.cast(schema)
+
+        key = (meta['kind'], meta['adaptlist'])
+        if key not in self.writers:
+            os.makedirs(os.path.join(self.out, meta['kind']), exist_ok=True)
+            path = os.path.join(self.out, meta['kind'], 'adaptlist=%d.arrow'%(meta['adaptlist']))
+            self.writers[key] = pa.ipc.new_file(path, table.schema)
+        self.writers[key].write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        words = sorted(self.words, key=self.words.get)
+        table = pa.table({'word': pa.array(words, type=pa.string())})
+        with pa.ipc.new_file(os.path.join(self.out, 'words.arrow'), table.schema) as writer:
+            writer.write_table(table)
+
+
+# Reads every surprisal file in fdir into the dataset in out. The workers read the files, and the
+# files are added in the order find_files gives them.
+def build(fdir, out, workers=8):
+    files = find_files(fdir)
+    writer = DatasetWriter(out, files)
+    pool = multiprocessing.Pool(workers)
+    try:
+        for i, (path, meta, df) in enumerate(pool.imap(read_file, files, chunksize=4)):
+            writer.add(meta, df)
+            if (i+1) % 1000 == 0:
+                print('%d/%d files'%(i+1, len(files)))
+    finally:
+        pool.close()
+        pool.join()
+    writer.close()
+    print('%d files, %d words'%(len(files), len(writer.words)))
+
+
+# The pre or post table of a dataset, memory-mapped. The word column is a dictionary over words.arrow.
+def load(out, kind):
+    with pa.memory_map(os.path.join(out, 'words.arrow')) as source:
+        words = pa.ipc.open_file(source).read_all().column('word').combine_chunks()
+    tables = []
+    for path in sorted(glob.glob(os.path.join(out, kind, '*.arrow'))):
+        tables.append(pa.ipc.open_file(pa.memory_map(path)).read_all())
+    table = pa.concat_tables(tables)
+    word = pa.chunked_array([pa.DictionaryArray.from_arrays(chunk, words) for chunk in table.column('word').chunks])
+    return(table.set_column(table.schema.get_field_index('word'), 'word', word))
+
+
+if __name__ == '__main__':
+    # python load_surprisal.py ../data/trained_model_surprisal/ ../data/dataframes/trained
+    build(sys.argv[1], sys.argv[2])
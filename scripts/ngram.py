@@ -0,0 +1,290 @@
+import sys
+import pickle
+import hashlib
+import numpy as np
+
+import priming
+
+# An interpolated Kneser-Ney n-gram model with the model interface of priming.py (score, adapt,
+# snapshot, restore), so that the whole pipeline (generate lists -> score -> adapt -> score ->
+# load_surprisal -> adaptation) can be run without an RNN or a GPU. Adaptation adds the counts of the adaptation sentences to the model and
+# restore() takes them out again.
+#
+# Every table of counts is a HashTable: open addressing over numpy arrays, with the n-gram as an int64
+# key (the word ids in base V). For every order k there is
+#   ngrams[k]    the count of the k-gram for the highest order, its continuation count N1+(. g) below
+#   contexts[k]  for the (k-1)-gram contexts: the sum of those counts and the number of words with a
+#                non-zero count (N1+(h .))
+# Words that are not in the vocabulary of the training sentences are scored, and written, as <unk>.
+# A model name like 0m_ngram_3 (no corpus size, 'ngram' as the corpus, the order as nhid) makes file
+# names load_surprisal.py reads.
+#
+#   model = NgramModel(3)
+#   model.train(priming.read_sentences('corpus.txt'))
+#   priming.run(model, '0m_ngram_3', '../stimuli', '../data/ngram_surprisal', amounts=[10, 20])
+
+bos = '<s>'
+eos = '</s>'
+unk = '<unk>'
+block_size = 1 << 22
+
+
+class HashTable(object):
+    def __init__(self, columns=1, capacity=1024):
+        self.columns = columns
+        self.size = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.bits = max(int(capacity - 1).bit_length(), 4)
+        self.mask = (1 << self.bits) - 1
+        self.keys = np.full(1 << self.bits, -1, dtype=np.int64)
+        self.values = np.zeros((1 << self.bits, self.columns), dtype=np.int64)
+
+    def slots(self, keys):
+        h = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        return((h >> np.uint64(64 - self.bits)).astype(np.int64))
+
+    # slot of every key, -1 for the keys that are not in the table
+    def find(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        found = np.full(len(keys), -1, dtype=np.int64)
+        slots = self.slots(keys)
+        todo = np.arange(len(keys))
+        while len(todo):
+            k = self.keys[slots[todo]]
+            hit = k == keys[todo]
+            found[todo[hit]] = slots[todo[hit]]
+            todo = todo[~hit & (k != -1)]
+            slots[todo] = (slots[todo] + 1) & self.mask
+        return(found)
+
+    # adds keys that are not in the table yet (and are all different)
+    def insert(self, keys, values=None):
+        if (self.size + len(keys)) * 2 > len(self.keys):
+            self.grow(self.size + len(keys))
+        slots = self.slots(keys)
+        todo = np.arange(len(keys))
+        while len(todo):
+            free = self.keys[slots[todo]] == -1
+            # of several keys that want the same free slot, the first one gets it
+            _, first = np.unique(slots[todo[free]], return_index=True)
+            done = todo[free][first]
+            self.keys[slots[done]] = keys[done]
+            if values is not None:
+                self.values[slots[done]] = values[done]
+            left = np.ones(len(todo), dtype=bool)
+            left[np.flatnonzero(free)[first]] = False
+            todo = todo[left]
+            slots[todo] = (slots[todo] + 1) & self.mask
+        self.size += len(keys)
+
+    def grow(self, size):
+        used = self.keys != -1
+        keys, values = self.keys[used], self.values[used]
+        self.allocate(size * 4)
+        self.size = 0
+        self.insert(keys, values)
+
+    # slots of the keys, inserting the missing ones (keys may repeat)
+    def slots_of(self, keys):
+        unique, inverse = np.unique(keys, return_inverse=True)
+        slots = self.find(unique)
+        if (slots < 0).any():
+            self.insert(unique[slots < 0])
+            slots = self.find(unique)
+        return(slots[inverse.ravel()])
+
+    def get(self, keys, column=0):
+        slots = self.find(keys)
+        values = np.zeros(len(slots), dtype=np.int64)
+        values[slots >= 0] = self.values[slots[slots >= 0], column]
+        return(values)
+
+    # keys and values with a non-zero first column
+    def items(self):
+        used = (self.keys != -1) & (self.values[:, 0] != 0)
+        return(self.keys[used], self.values[used])
+
+
+# discount of a table from its count of counts, 0.75 if there are too few counts to tell
+def discount(counts):
+    n1, n2 = (counts == 1).sum(), (counts == 2).sum()
+    if n1 == 0 or n2 == 0:
+        return(0.75)
+    return(min(max(n1 / (n1 + 2.0 * n2), 0.1), 0.9))
+
+
+class NgramModel(object):
+    def __init__(self, order=3):
+        self.order = order
+        self.vocab = {}
+        self.words = []
+        self.log = []
+        self.base_id = ''
+
+    def train(self, sentences):
+        self.words = [bos, eos, unk] + sorted(set(w for s in sentences for w in str.split(s)) - set([bos, eos, unk]))
+        self.vocab = dict((w, i) for i, w in enumerate(self.words))
+        self.V = len(self.words)
+        if self.V ** self.order >= 2 ** 62:
+            raise ValueError('vocabulary of %d words too large for %d-grams'%(self.V, self.order))
+        self.ngrams = [None] + [HashTable(1) for k in range(self.order)]
+        self.contexts = [None] + [HashTable(2) for k in range(self.order)]
+        self.log = []
+        self.add(self.ngram_keys(sentences)[0])
+        self.log = []
+        self.discounts = [None] + [discount(self.ngrams[k].items()[1][:, 0]) for k in range(1, self.order + 1)]
+        self.base_id = hashlib.sha1(pickle.dumps((self.order, self.words, [self.ngrams[k].items()[1].tolist() for k in range(1, self.order + 1)]))).hexdigest()
+
+    def ids(self, sentence):
+        return([self.vocab.get(w, self.vocab[unk]) for w in str.split(sentence)])
+
+    # Keys of the n-grams of the highest order ending in every word of the sentences and in </s>,
+    # with n-1 <s> before every sentence. Also returns, for every key, whether it ends in </s>.
+    def ngram_keys(self, sentences):
+        n, V = self.order, self.V
+        tokens, real, ends = [], [], []
+        for s in sentences:
+            ids = self.ids(s)
+            tokens.extend([0] * (n - 1) + ids + [1])
+            real.extend([False] * (n - 1) + [True] * (len(ids) + 1))
+            ends.extend([False] * (n - 1 + len(ids)) + [True])
+        tokens = np.array(tokens, dtype=np.int64)
+        pad = np.concatenate([np.zeros(n - 1, dtype=np.int64), tokens])
+        keys = np.zeros(len(tokens), dtype=np.int64)
+        for i in range(n):
+            keys = keys * V + pad[i:i + len(tokens)]
+        real = np.array(real, dtype=bool)
+        return(keys[real], np.array(ends, dtype=bool)[real])
+
+    # Adds one occurrence of every key (n-grams of the highest order) to the tables. New n-gram types
+    # add to the continuation counts of the order below, and so on.
+    def add(self, keys):
+        V = self.V
+        keys, counts = np.unique(keys, return_counts=True)
+        for k in range(self.order, 0, -1):
+            if not len(keys):
+                break
+            table = self.ngrams[k]
+            slots = table.slots_of(keys)
+            new = table.values[slots, 0] == 0
+            np.add.at(table.values[:, 0], slots, counts)
+            self.log.append((table, keys, counts, 0))
+
+            ctx = keys // V
+            ctx_keys, inverse = np.unique(ctx, return_inverse=True)
+            inverse = inverse.ravel()
+            ctx_table = self.contexts[k]
+            ctx_slots = ctx_table.slots_of(ctx_keys)
+            sums = np.bincount(inverse, weights=counts, minlength=len(ctx_keys)).astype(np.int64)
+            types = np.bincount(inverse, weights=new, minlength=len(ctx_keys)).astype(np.int64)
+            np.add.at(ctx_table.values[:, 0], ctx_slots, sums)
+            np.add.at(ctx_table.values[:, 1], ctx_slots, types)
+            self.log.append((ctx_table, ctx_keys, sums, 0))
+            self.log.append((ctx_table, ctx_keys, types, 1))
+
+            # every new type is one more left context for its suffix
+            keys, counts = np.unique(keys[new] % (V ** (k - 1)), return_counts=True) if k > 1 else (keys[:0], counts[:0])
+
+    # probability of every word of the vocabulary under the unigram distribution
+    def unigram(self):
+        D = self.discounts[1]
+        p = np.zeros(self.V)
+        total, types = self.contexts[1].get(np.zeros(1, dtype=np.int64), 0)[0], self.contexts[1].get(np.zeros(1, dtype=np.int64), 1)[0]
+        uniform = np.full(self.V, 1.0 / (self.V - 1))
+        uniform[0] = 0
+        p += uniform * D * types / total
+        keys, values = self.ngrams[1].items()
+        p[keys] += np.maximum(values[:, 0] - D, 0) / total
+        return(p)
+
+    # P(word | context) for every order from 2 up, from the probability of the order below
+    def interpolate(self, k, contexts, words, p):
+        D = self.discounts[k]
+        sums = self.contexts[k].get(contexts, 0).astype(np.float64)
+        types = self.contexts[k].get(contexts, 1)
+        counts = self.ngrams[k].get(contexts * self.V + words)
+        seen = sums > 0
+        out = p.copy()
+        out[seen] = np.maximum(counts[seen] - D, 0) / sums[seen] + D * types[seen] / sums[seen] * p[seen]
+        return(out)
+
+    # Full distributions of the words after the given contexts (of n-1 words), in rows
+    def distributions(self, contexts, index):
+        V = self.V
+        P = np.tile(self.unigram(), (len(contexts), 1))
+        for k in range(2, self.order + 1):
+            ctx = contexts % (V ** (k - 1))
+            D = self.discounts[k]
+            sums = self.contexts[k].get(ctx, 0).astype(np.float64)
+            types = self.contexts[k].get(ctx, 1)
+            seen = sums > 0
+            P[seen] *= (D * types[seen] / sums[seen])[:, None]
+            # the n-grams of every context, from the table sorted by context
+            ctx_sorted, ngram_words, values = index[k]
+            lo = np.searchsorted(ctx_sorted, ctx, 'left')
+            lengths = np.searchsorted(ctx_sorted, ctx, 'right') - lo
+            rows = np.repeat(np.arange(len(ctx)), lengths)
+            entries = np.arange(lengths.sum()) + np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+            P[rows, ngram_words[entries]] += np.maximum(values[entries] - D, 0) / sums[rows]
+        return(P)
+
+    def score(self, sentences):
+        n, V = self.order, self.V
+        words = [str.split(s) for s in sentences]
+        keys, ends = self.ngram_keys(sentences)
+        keys = keys[~ends]
+        targets = keys % V
+        p = self.unigram()[targets]
+        for k in range(2, n + 1):
+            p = self.interpolate(k, (keys // V) % (V ** (k - 1)), targets, p)
+        surprisal = -np.log2(p)
+
+        # entropy of the distribution after every distinct context
+        index = [None] + [None] + [self.sorted_items(k) for k in range(2, n + 1)]
+        contexts, inverse = np.unique(keys // V, return_inverse=True)
+        entropy = np.zeros(len(contexts))
+        step = max(1, block_size // V)
+        for start in range(0, len(contexts), step):
+            P = self.distributions(contexts[start:start + step], index)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                entropy[start:start + step] = -np.where(P > 0, P * np.log2(P), 0).sum(axis=1)
+        entropy = entropy[inverse.ravel()]
+
+        scores = []
+        i = 0
+        for ws in words:
+            scores.append([(w if w in self.vocab else unk, surprisal[i + j], entropy[i + j]) for j, w in enumerate(ws)])
+            i += len(ws)
+        return(scores)
+
+    # the n-grams of order k sorted by context: (contexts, words, counts)
+    def sorted_items(self, k):
+        keys, values = self.ngrams[k].items()
+        order = np.argsort(keys // self.V, kind='stable')
+        return(keys[order] // self.V, keys[order] % self.V, values[order, 0])
+
+    def adapt(self, sentences):
+        self.add(self.ngram_keys(sentences)[0])
+
+    def snapshot(self):
+        return(len(self.log))
+
+    # takes out the counts added since the snapshot. The keys stay in the tables with a count of 0.
+    def restore(self, state):
+        while len(self.log) > state:
+            table, keys, values, column = self.log.pop()
+            np.add.at(table.values[:, column], table.find(keys), -values)
+
+    def fingerprint(self):
+        if not self.log:
+            return(self.base_id)
+        return(hashlib.sha1((self.base_id + repr([(k.tolist(), v.tolist(), c) for _, k, v, c in self.log])).encode('utf-8')).hexdigest())
+
+
+if __name__ == '__main__':
+    # python ngram.py <training sentences> <stimuli dir> <output dir>
+    model = NgramModel(3)
+    model.train(priming.read_sentences(sys.argv[1]))
+    priming.run(model, '0m_ngram_3', sys.argv[2], sys.argv[3], amounts=[10, 20])
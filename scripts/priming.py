@@ -0,0 +1,214 @@
+import os
+import re
+import glob
+import json
+import pickle
+import hashlib
+import collections
+
+# Runs the whole priming experiment for one language model: the test sets of every list are scored
+# before adaptation, the model is adapted on the adaptation set of every structure, and the test sets
+# are scored again. The surprisal files are written in the format and with the names load_data.Rmd
+# and load_surprisal.py read:
+#   <model>.<amt>_<list>..<test>.pre  and  <model>.<amt>_<list>.<adapt>.<test>.post
+#
+# The model is any object with these methods:
+#   score(sentences)  for a batch of sentences (strings), one list of (word, surprisal, entropy) per sentence
+#   adapt(sentences)  updates the model on the sentences, in order, one after the other
+#   snapshot()        returns the current state of the model (picklable, unless it has fingerprint)
+#   restore(state)    goes back to a state returned by snapshot
+#   fingerprint()     optional: a string that changes whenever the weights do, e.g. the hash of the
+#                     checkpoint file. Without it the pickled snapshot is hashed (see fingerprint below).
+#
+# Adapting on the first 10 sentences and then on the next 10 has to be the same as adapting on the
+# first 20: the amounts of adaptation of one structure are then run one after the other, from a single
+# restore of the unadapted model.
+#
+# The scores of the unadapted model only depend on the model and the sentence, so they can be kept in a
+# ScoreCache and shared between runs (other adaptation structures or amounts, other lists with the
+# same test sentences, a run that was interrupted, ...).
+#
+#   run(model, '10m_a_100', '../stimuli/', '../data/surprisal/10m_a_100', lists=['6', '7'], amounts=[10, 20])
+#   run(model, '10m_a_100', '../stimuli/', '../data/surprisal/10m_a_100', cache=ScoreCache('../data/score_cache'))
+
+structures = ['orc', 'orrc', 'prc', 'prrc', 'src', 'ocont', 'scont']
+header = 'word sentid sentpos wlen surp entropy entred\n'
+trained_name = '{model}.{amt}_{list}.{adapt}.{test}.{kind}'
+
+
+def fingerprint(model):
+    if hasattr(model, 'fingerprint'):
+        return(str(model.fingerprint()))
+    return(hashlib.sha1(pickle.dumps(model.snapshot(), protocol=4)).hexdigest())
+
+
+# Scores of sentences by models, stored on disk as one json file per model and sentence:
+#   <cache_dir>/<model fingerprint>/<sentence hash>.json
+# The sentence hash is that of its words, so spacing does not matter. The last capacity entries used
+# are also kept in memory; when the disk holds more than disk_capacity entries, the ones used least
+# recently are removed.
+class ScoreCache(object):
+    def __init__(self, cache_dir, capacity=100000, disk_capacity=None):
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.disk_entries = len(glob.glob(os.path.join(cache_dir, '*', '*.json')))
+
+    def path(self, model_key, sentence):
+        key = hashlib.sha1(' '.join(str.split(sentence)).encode('utf-8')).hexdigest()
+        return(os.path.join(self.cache_dir, model_key, key + '.json'))
+
+    def remember(self, path, scores):
+        self.memory[path] = scores
+        self.memory.move_to_end(path)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get(self, model_key, sentence):
+        path = self.path(model_key, sentence)
+        if path in self.memory:
+            self.memory.move_to_end(path)
+            self.hits += 1
+            return(self.memory[path])
+        if os.path.exists(path):
+            with open(path) as f:
+                scores = [tuple(s) for s in json.load(f)]
+            # the modification time is the time of last use for the eviction
+            os.utime(path)
+            self.remember(path, scores)
+            self.disk_hits += 1
+            return(scores)
+        self.misses += 1
+        return(None)
+
+    def put(self, model_key, sentence, scores):
+        path = self.path(model_key, sentence)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            self.disk_entries += 1
+        with open(path + '.tmp', 'w') as f:
+            json.dump([list(s) for s in scores], f)
+        os.replace(path + '.tmp', path)
+        self.remember(path, scores)
+        if self.disk_capacity is not None and self.disk_entries > self.disk_capacity:
+            self.evict()
+
+    # removes the least recently used entries until the disk is at 90% of its capacity
+    def evict(self):
+        paths = sorted(glob.glob(os.path.join(self.cache_dir, '*', '*.json')), key=os.path.getmtime)
+        remove = len(paths) - int(self.disk_capacity * 0.9)
+        for path in paths[:max(remove, 0)]:
+            os.remove(path)
+            self.memory.pop(path, None)
+        self.disk_entries = len(paths) - max(remove, 0)
+
+    # scores of the sentences by the model, scoring only the ones that are not in the cache
+    def score(self, model, model_key, sentences, batch_size=64):
+        scores = [self.get(model_key, sentence) for sentence in sentences]
+        todo = [i for i, s in enumerate(scores) if s is None]
+        new = score_all(model, [sentences[i] for i in todo], batch_size)
+        for i, s in zip(todo, new):
+            s = [tuple(w) for w in s]
+            self.put(model_key, sentences[i], s)
+            scores[i] = s
+        return(scores)
+
+    def report(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return('%d sentences looked up: %d in memory, %d on disk, %d scored (hit rate %.1f%%), %d entries on disk'%(lookups, self.hits, self.disk_hits, self.misses, 100.0 * (lookups - self.misses) / max(lookups, 1), self.disk_entries))
+
+
+# Sentences of a list file, either one per line (stimuli/) or as make_files writes them, with a header
+# and the region and number after the sentence
+def read_sentences(path):
+    with open(path) as f:
+        lines = [line.rstrip('\n') for line in f]
+    if lines and lines[0].startswith('sentence,'):
+        lines = [line.rsplit(',', 3)[0] for line in lines[1:]]
+    return([line.strip() for line in lines if line.strip()])
+
+
+def find_lists(stim_dir):
+    pattern = re.compile(r'^list(.+)_(%s)\.txt$'%('|'.join(structures)))
+    lists = set()
+    for path in glob.glob(os.path.join(stim_dir, 'test', 'list*.txt')):
+        m = pattern.match(os.path.basename(path))
+        if m:
+            lists.add(m.group(1))
+    return(sorted(lists, key=lambda l: (len(l), l)))
+
+
+# lines of a surprisal file for the scores of the sentences
+def format_scores(scores):
+    lines = [header]
+    for sentid, words in enumerate(scores):
+        previous = None
+        for sentpos, (word, surp, entropy) in enumerate(words):
+            entred = 0.0 if previous is None else max(previous - entropy, 0.0)
+            previous = entropy
+            lines.append('%s %d %d %d %.4f %.4f %.4f\n'%(word, sentid, sentpos, len(word), surp, entropy, entred))
+    return(lines)
+
+
+def score_all(model, sentences, batch_size):
+    scores = []
+    for start in range(0, len(sentences), batch_size):
+        scores.extend(model.score(sentences[start:start+batch_size]))
+    return(scores)
+
+
+def write_scores(lines, path):
+    with open(path + '.tmp', 'w') as f:
+        f.writelines(lines)
+    os.replace(path + '.tmp', path)
+
+
+# Scores the lists (all those in stim_dir/test by default) before and after adapting on every
+# structure, with amt sentences of adaptation for every amt in amounts. name_format can be changed
+# for other naming schemes, e.g. '100.{list}.3.{adapt}.{test}.{kind}' for the untrained models. With a
+# cache (ScoreCache), the unadapted scores are looked up in it first.
+def run(model, model_name, stim_dir, out_dir, lists=None, amounts=[20], adapt_structures=structures, test_structures=structures, batch_size=64, name_format=trained_name, cache=None):
+    if lists is None:
+        lists = find_lists(stim_dir)
+    amounts = sorted(amounts)
+    os.makedirs(out_dir, exist_ok=True)
+    base = model.snapshot()
+    if cache is not None:
+        model_key = fingerprint(model)
+
+    def path(l, amt, adapt, test, kind):
+        return(os.path.join(out_dir, name_format.format(model=model_name, amt=amt, list=l, adapt=adapt, test=test, kind=kind)))
+
+    for l in lists:
+        tests = dict((test, read_sentences(os.path.join(stim_dir, 'test', 'list%s_%s.txt'%(l, test)))) for test in test_structures)
+
+        # the unadapted model scores the same for every amount
+        model.restore(base)
+        for test in test_structures:
+            if cache is not None:
+                lines = format_scores(cache.score(model, model_key, tests[test], batch_size))
+            else:
+                lines = format_scores(score_all(model, tests[test], batch_size))
+            for amt in amounts:
+                write_scores(lines, path(l, amt, '', test, 'pre'))
+
+        for adapt in adapt_structures:
+            sentences = read_sentences(os.path.join(stim_dir, 'adapt', 'list%s_%s.txt'%(l, adapt)))
+            if len(sentences) < amounts[-1]:
+                raise ValueError('list %s_%s has %d adaptation sentences, %d needed'%(l, adapt, len(sentences), amounts[-1]))
+            model.restore(base)
+            done = 0
+            for amt in amounts:
+                model.adapt(sentences[done:amt])
+                done = amt
+                for test in test_structures:
+                    write_scores(format_scores(score_all(model, tests[test], batch_size)), path(l, amt, adapt, test, 'post'))
+        print('list %s done'%(l))
+    model.restore(base)
+    if cache is not None:
+        print(cache.report())
@@ -0,0 +1,154 @@
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from adaptation import group_index
+from adaptation import summarise
+
+# Bootstrap confidence intervals and permutation tests for the adaptation effects of adaptation.py,
+# next to the t-based intervals of data_summary.
+#
+# Every cell (a group of rows, e.g. one adapt x test pair) is resampled on its own. The resamples of
+# a cell are a matrix of row indices (or of partial row-wise shuffles of the cell for permutations) and the
+# statistic of every resample is a reduction over that matrix, computed in blocks of at most
+# block_size numbers. Cells are sharded over a process pool. Every cell draws from its own generator,
+# seeded by (seed, cell number), so the results do not depend on the number of workers.
+#
+#   all20 = adaptation.adaptation_effects(pre, post, amt=20)
+#   bootstrap_ci(all20, 'corrected_diff', ['adapt', 'test'], workers=4)
+#   permutation_test(all20, 'corrected_diff', ['adapt'], 'diagonal', workers=4)
+
+block_size = 1 << 24
+
+
+def cell_rng(seed, cell):
+    return(np.random.default_rng([seed, cell]))
+
+
+# means of nboot resamples (with replacement) of values
+def bootstrap_means(values, nboot, rng):
+    n = len(values)
+    means = np.empty(nboot)
+    step = max(1, block_size // max(n, 1))
+    for start in range(0, nboot, step):
+        stop = min(start + step, nboot)
+        idx = rng.integers(0, n, size=(stop - start, n), dtype=np.int32)
+        means[start:stop] = values[idx].mean(axis=1)
+    return(means)
+
+
+def bootstrap_cell(task):
+    cell, values, nboot, alpha, seed = task
+    means = bootstrap_means(values, nboot, cell_rng(seed, cell))
+    lo, hi = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return(cell, lo, hi, means.std(ddof=1))
+
+
+# Sums of m values drawn without replacement from values, for k draws at once. For small m: the first
+# m steps of a Fisher-Yates shuffle of every row of a k x n copy of values, so m steps instead of a
+# full shuffle. Every step is a few numpy calls on k numbers, so for large m (tens of thousands of
+# rows in a cell of the full grid) the m values of every row are instead the ones with the m smallest
+# of n random keys, found with one argpartition of the k x n keys. The partial shuffle is used while it
+# is the cheaper of the two: one step costs about as much as partitioning (256 + k) / 4 keys.
+def subset_sums(values, m, k, rng):
+    n = len(values)
+    if m * (256 + k) * 4 >= k * n:
+        keys = rng.random((k, n))
+        return(values[np.argpartition(keys, m - 1, axis=1)[:, :m]].sum(axis=1))
+    pool = np.tile(values, (k, 1))
+    rows = np.arange(k)
+    sums = np.zeros(k)
+    for j in range(m):
+        pick = rng.integers(j, n, size=k)
+        chosen = pool[rows, pick]
+        sums += chosen
+        pool[rows, pick] = pool[:, j]
+    return(sums)
+
+
+# Difference between the mean of the rows with label and the rest, for the cell and for nperm
+# shuffles of the labels within the cell. Returns (observed, two-sided p value).
+def permutation_cell(task):
+    cell, values, label, nperm, seed = task
+    rng = cell_rng(seed, cell)
+    n, na = len(values), int(label.sum())
+    if na == 0 or na == n:
+        return(cell, np.nan, np.nan)
+    total = values.sum()
+    observed = values[label].mean() - (total - values[label].sum()) / (n - na)
+
+    # only the smaller group has to be drawn
+    m = min(na, n - na)
+    extreme = 0
+    step = max(1, block_size // n)
+    for start in range(0, nperm, step):
+        sums = subset_sums(values, m, min(step, nperm - start), rng)
+        if m != na:
+            sums = total - sums
+        stats = sums / na - (total - sums) / (n - na)
+        extreme += int((np.abs(stats) >= abs(observed) - 1e-12).sum())
+    return(cell, observed, (extreme + 1) / (nperm + 1))
+
+
+def run(func, tasks, workers):
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(func, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [func(task) for task in tasks]
+    return(results)
+
+
+# rows of every cell of by, biggest cells first so that the pool is balanced
+def cells(df, by):
+    gid, first = group_index(df, by)
+    order = np.argsort(gid, kind='stable')
+    bounds = np.cumsum(np.bincount(gid, minlength=len(first)))
+    rows = np.split(order, bounds[:-1])
+    todo = sorted(range(len(first)), key=lambda g: -len(rows[g]))
+    return(first, rows, todo)
+
+
+# summarise(df, var, by) plus the percentile bootstrap interval of the mean of every cell
+# (boot_lo, boot_hi) and the bootstrap standard error (boot_se)
+def bootstrap_ci(df, var, by, nboot=10000, alpha=0.05, seed=7, workers=1):
+    first, rows, todo = cells(df, by)
+    values = df[var].to_numpy(dtype=np.float64)
+    results = run(bootstrap_cell, [(g, values[rows[g]], nboot, alpha, seed) for g in todo], workers)
+
+    out = df.iloc[first][by].reset_index(drop=True)
+    for name, i in [('boot_lo', 1), ('boot_hi', 2), ('boot_se', 3)]:
+        column = np.empty(len(first))
+        for r in results:
+            column[r[0]] = r[i]
+        out[name] = column
+    return(summarise(df, var, by).merge(out, on=by))
+
+
+# Permutation test, in every cell of by, of the difference in var between the rows where label is
+# true (or equal to its first level, e.g. 'diagonal') and the others. For analysis 1 of
+# conll2019_analyses.Rmd (same vs. different test structure for every adaptation structure):
+#   permutation_test(all20, 'corrected_diff', ['adapt'], 'diagonal')
+def permutation_test(df, var, by, label, nperm=10000, seed=7, workers=1):
+    first, rows, todo = cells(df, by)
+    values = df[var].to_numpy(dtype=np.float64)
+    labels = df[label]
+    if labels.dtype != bool:
+        labels = labels == sorted(labels.astype(str).unique())[0]
+    labels = labels.to_numpy(dtype=bool)
+    results = run(permutation_cell, [(g, values[rows[g]], labels[rows[g]], nperm, seed) for g in todo], workers)
+
+    out = df.iloc[first][by].reset_index(drop=True)
+    out['N'] = [len(r) for r in rows]
+    out['N_%s'%(label)] = [int(labels[r].sum()) for r in rows]
+    diff, p = np.empty(len(first)), np.empty(len(first))
+    for g, observed, pvalue in results:
+        diff[g] = observed
+        p[g] = pvalue
+    out['diff'] = diff
+    out['p'] = p
+    return(out.sort_values(by).reset_index(drop=True))
@@ -0,0 +1,77 @@
+import bisect
+import random
+import itertools
+
+from lexicon import lexicon
+
+# Grammatical number of the nouns of an item. Every noun that has a plural is plural 2 times out of 5,
+# and the nouns of an item together have to meet the constraints of the structures. create_set used
+# to redraw the numbers of all the nouns until they did; a NumberSampler instead lists every joint
+# configuration, weighs it by its probability under the independent draws and keeps the ones that are
+# allowed, so one draw gives a configuration from the same distribution the redrawing gave.
+#
+# A noun that is its own plural (water, juice, ...) is always singular. (The redrawing could call it
+# plural, which the phrase then did not show.) The numbers drawn are therefore the numbers the phrases
+# have, and what depends on them (the "that" controls, "by themselves") can use them directly.
+
+p_plural = 0.4
+numbers = ['singular', 'plural']
+
+
+class NumberSampler(object):
+    def __init__(self, slots, allowed=None, p_plural=p_plural):
+        self.slots = tuple(slots)
+        self.allowed = allowed
+        self.p_plural = p_plural
+        self.configs = list(itertools.product(numbers, repeat=len(self.slots)))
+        self.tables = {}
+
+    # probability of every configuration, not normalised, for nouns that can (True) or cannot be plural
+    def weights(self, countable):
+        out = []
+        for config in self.configs:
+            w = 1.0
+            for num, can in zip(config, countable):
+                if num == 'plural':
+                    w *= self.p_plural if can else 0.0
+                else:
+                    w *= 1.0 - self.p_plural if can else 1.0
+            if self.allowed is not None and not self.allowed(dict(zip(self.slots, config))):
+                w = 0.0
+            out.append(w)
+        return(out)
+
+    # cumulative weights, one table for every combination of countable nouns
+    def table(self, countable):
+        countable = tuple(countable)
+        if countable not in self.tables:
+            self.tables[countable] = list(itertools.accumulate(self.weights(countable)))
+        return(self.tables[countable])
+
+    # the numbers of the nouns (one per slot), as a tuple of 'singular'/'plural'
+    def draw(self, nouns, rng=random):
+        cum = self.table([lexicon.plural.get(noun, noun) != noun for noun in nouns])
+        return(self.configs[bisect.bisect_right(cum, rng.random() * cum[-1])])
+
+
+def inflect(noun, num):
+    return(lexicon.plural[noun] if num == 'plural' else noun)
+
+
+# What the "that" controls need (see create_sents): obj3 is singular, so it can take "that" when the
+# subject cannot, and the subject and the object are not both plural.
+def that_controls(nums):
+    return(nums['obj3'] == 'singular' and not (nums['subj'] == 'plural' and nums['obj'] == 'plural'))
+
+
+item_numbers = NumberSampler(['subj', 'obj', 'obj2', 'obj3'], that_controls)
+coord_numbers = NumberSampler(['coord'])
+
+reflexives = ['by himself', 'by herself', 'by itself']
+
+
+# the by phrase agrees with the subject
+def agree_by_phrase(by_phrase, subj_num):
+    if subj_num == 'plural' and by_phrase in reflexives:
+        return('by themselves')
+    return(by_phrase)
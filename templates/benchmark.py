@@ -0,0 +1,190 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+
+from create_rcs import get_byphrases
+from create_rcs import get_adapt_classes
+from create_rcs import get_adapt_test
+from create_rcs import create_set
+from create_rcs import create_sents
+from create_rcs import make_files
+
+# Benchmarks of the stages of generating a list, to tell whether a change makes generation faster or
+# slower:
+#   get_adapt_test  the adapt and test sets of a list, n items each (2n items, for the items/s)
+#   create_set      n items of an adapt set
+#   create_sents    the sentences of every condition for n items (made beforehand)
+#   make_files      the files of n items (made beforehand), written to a temporary directory
+# Every benchmark is timed at every size (the best of a few runs for the small ones) and, up to
+# memory_sizes items, run once more under tracemalloc for the peak memory it allocates and
+# blocks_left, the number of memory blocks still allocated at the end that were not before (not the
+# number of allocations made). tracemalloc makes a run a few times slower, and the memory grows
+# linearly with the items anyway.
+# The results are written as json and can be compared with those of an earlier run:
+#
+#   python benchmark.py bench.json                  # run and write the results
+#   python benchmark.py new.json bench.json         # run, write and compare with bench.json
+#
+# A benchmark is flagged when its time or its peak memory is more than threshold (20%) above the
+# baseline. python benchmark.py exits with 1 then.
+
+sizes = [10, 1000, 10000, 100000]
+memory_sizes = 10000
+threshold = 0.2
+seed = 7
+
+
+def adapt_classes():
+    random.seed(seed)
+    adapt_byphrases, _ = get_byphrases(random.randint(0,1))
+    verb_classes, noun_classes, adj_classes, adv_classes, _ = get_adapt_classes()
+    return(verb_classes, noun_classes, adj_classes, adv_classes, adapt_byphrases)
+
+
+# items are immutable, so the ones made for a size are kept for every benchmark that needs them
+made = {}
+def items(n):
+    if n not in made:
+        made[n], _, _, _, _ = create_set(*(adapt_classes() + (n,)))
+    return(made[n])
+
+
+# Every benchmark is (setup, run): setup(n) makes what run takes, and only run is measured
+def setup_get_adapt_test(n):
+    random.seed(seed)
+    return(n)
+
+
+def run_get_adapt_test(n):
+    get_adapt_test(n, n)
+
+
+def setup_create_set(n):
+    return(adapt_classes() + (n,))
+
+
+def run_create_set(args):
+    create_set(*args)
+
+
+def setup_create_sents(n):
+    args_list = items(n)
+    random.seed(seed)
+    return(args_list)
+
+
+def run_create_sents(args_list):
+    for args in args_list:
+        create_sents(args)
+
+
+def setup_make_files(n):
+    args_list = items(n)
+    random.seed(seed)
+    return(args_list, tempfile.mkdtemp(prefix='benchmark'))
+
+
+def run_make_files(task):
+    args_list, tmp = task
+    try:
+        make_files(args_list, os.path.join(tmp, 'list'))
+    finally:
+        shutil.rmtree(tmp)
+
+
+# (name, setup, run, items made per item of n)
+benchmarks = [
+    ('get_adapt_test', setup_get_adapt_test, run_get_adapt_test, 2),
+    ('create_set', setup_create_set, run_create_set, 1),
+    ('create_sents', setup_create_sents, run_create_sents, 1),
+    ('make_files', setup_make_files, run_make_files, 1),
+]
+
+
+# seconds of one run, with what the stages print thrown away
+def timed(setup, run, n):
+    arg = setup(n)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        run(arg)
+        return(time.perf_counter() - start)
+
+
+# (peak bytes allocated, blocks still allocated at the end that were not at the start) of one run
+def traced(setup, run, n):
+    arg = setup(n)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            run(arg)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    blocks_left = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return(peak, blocks_left)
+
+
+def run(sizes=sizes, memory_sizes=memory_sizes):
+    results = {}
+    for name, setup, func, per_item in benchmarks:
+        for n in sizes:
+            repeat = 5 if n <= 1000 else 3 if n <= 10000 else 1
+            seconds = min(timed(setup, func, n) for _ in range(repeat))
+            items = n * per_item
+            result = dict(n=n, items=items, seconds=seconds, items_per_second=items / seconds if seconds > 0 else None)
+            if n <= memory_sizes:
+                result['peak_bytes'], result['blocks_left'] = traced(setup, func, n)
+            results['%s/%d'%(name, n)] = result
+            print('%-24s %10.4f s %12.0f items/s'%('%s/%d'%(name, n), seconds, items / seconds if seconds > 0 else 0))
+    made.clear()
+    return(dict(python=platform.python_version(), machine=platform.machine(), time=time.strftime('%Y-%m-%d %H:%M:%S'), results=results))
+
+
+# The benchmarks of report that are more than threshold slower, or take more than threshold more
+# memory, than in baseline: (benchmark, what, baseline value, new value)
+def compare(report, baseline, threshold=threshold):
+    regressions = []
+    for key, result in report['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        for what in ['seconds', 'peak_bytes']:
+            if what in result and old.get(what) and result[what] > old[what] * (1 + threshold):
+                regressions.append((key, what, old[what], result[what]))
+    return(regressions)
+
+
+def print_comparison(report, baseline):
+    print('%-24s %10s %10s %8s %12s %12s %8s'%('benchmark', 'seconds', 'baseline', 'change', 'peak MB', 'baseline', 'change'))
+    for key, result in report['results'].items():
+        old = baseline['results'].get(key, {})
+        def change(what):
+            return('%+7.1f%%'%(100.0 * (result[what] / old[what] - 1)) if old.get(what) and what in result else '')
+        def mb(d):
+            return('%12.2f'%(d['peak_bytes'] / 1e6) if 'peak_bytes' in d else '%12s'%(''))
+        print('%-24s %10.4f %10s %8s %s %s %8s'%(key, result['seconds'], '%.4f'%(old['seconds']) if 'seconds' in old else '', change('seconds'), mb(result), mb(old), change('peak_bytes')))
+
+
+if __name__ == '__main__':
+    report = run()
+    with open(sys.argv[1], 'w') as f:
+        json.dump(report, f, indent=1)
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            baseline = json.load(f)
+        print_comparison(report, baseline)
+        regressions = compare(report, baseline)
+        for key, what, old, new in regressions:
+            print('REGRESSION %s %s: %.4g -> %.4g'%(key, what, old, new))
+        if regressions:
+            sys.exit(1)
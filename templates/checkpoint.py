@@ -0,0 +1,89 @@
+import os
+import pickle
+import random
+
+# Checkpoints for generating one list item by item (create_lists(..., checkpoint_every=n)), so that a
+# run that is stopped can be started again and carry on where it was, with the same output as a run
+# that was never stopped.
+#
+# Making a list goes through these stages, in order: the items of the adapt set, the items of the
+# test set, the adapt files and the test files. Every n items a stage saves what it needs to go on
+# from there to <path>: the state of the random module, the item number, and the classes and
+# used-word sets (for the sets) or the size of the files written so far (for the files). The items of
+# the sets are appended to <path>.<stage> in chunks, and the state has how many bytes of them are
+# committed, so a chunk written after the last save is thrown away again.
+
+stages = ['adapt_set', 'test_set', 'adapt_files', 'test_files']
+
+
+# key is what the list is made from (its name, sizes and seed); a checkpoint left by a run with another
+# key is not resumed from
+class Checkpoint(object):
+    def __init__(self, path, every=1000, key=None):
+        self.path = path
+        self.every = every
+        self.key = key
+        self.state = None
+        self.offsets = {}
+        self.context = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if state['key'] == key:
+                self.state = state
+                self.offsets = dict(state['offsets'])
+                self.context = dict(state['context'])
+            else:
+                self.remove()
+
+    # whether the run that is resumed had already finished stage
+    def past(self, stage):
+        return(self.state is not None and stages.index(self.state['stage']) > stages.index(stage))
+
+    # The saved state of stage if the run stopped during it, with the random module back where it was
+    def resume(self, stage):
+        if self.state is not None and self.state['stage'] == stage:
+            random.setstate(self.state['random'])
+            return(self.state)
+        return(None)
+
+    # whether item i of a stage should be saved: every n items, but not the one it was resumed from
+    def due(self, i, resumed):
+        return(i % self.every == 0 and not (resumed is not None and resumed['i'] == i))
+
+    def save(self, stage, **state):
+        state['stage'] = stage
+        state['key'] = self.key
+        state['random'] = random.getstate()
+        state['offsets'] = dict(self.offsets)
+        state['context'] = dict(self.context)
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self.state = state
+
+    def add_items(self, stage, items):
+        with open('%s.%s'%(self.path, stage), 'ab') as f:
+            pickle.dump(items, f, protocol=4)
+            f.flush()
+            os.fsync(f.fileno())
+            self.offsets[stage] = f.tell()
+
+    # the committed items of a stage
+    def load_items(self, stage):
+        path = '%s.%s'%(self.path, stage)
+        items = []
+        if not os.path.exists(path):
+            return(items)
+        with open(path, 'r+b') as f:
+            f.truncate(self.offsets.get(stage, 0))
+            while f.tell() < self.offsets.get(stage, 0):
+                items.extend(pickle.load(f))
+        return(items)
+
+    def remove(self):
+        for path in [self.path] + ['%s.%s'%(self.path, stage) for stage in stages]:
+            if os.path.exists(path):
+                os.remove(path)
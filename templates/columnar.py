@@ -0,0 +1,261 @@
+import os
+import json
+import shutil
+import numpy as np
+
+from items import fields
+from structures import regions
+
+# Columnar version of the files make_files writes: one table per list (adapt or test) with the rows of
+# every condition, stored as a directory <fname>.cols of raw little-endian arrays plus meta.json. Every
+# column can be memory-mapped (see ColumnTable), so reading a list for an evaluation does not parse
+# any text.
+#
+# Columns, one entry per row unless noted:
+#   cond                 index into meta['conds']
+#   item                 item number within the list; the same item has the same number in every condition
+#   sentence_data        utf-8 bytes of all the sentences, one after the other
+#   sentence_offsets     nrows+1 byte offsets into sentence_data
+#   token_data           byte offset of every word within its sentence
+#   token_offsets        nrows+1 offsets into token_data
+#   region_start         rc_startpos of the txt files (in words)
+#   region_length        rc_length of the txt files (in words)
+#   num                  subj_num of the txt files, 0 singular and 1 plural
+#   span_name            for every span of every row (see structures.regions): index into meta['spans']
+#   span_length          the number of words of the span; the spans of a row cover it in order
+#   span_offsets         nrows+1 offsets into span_name and span_length
+#   <field> for every field of items.Item: the phrase of the item, as an index into the vocabulary
+#   vocab_data, vocab_offsets   the vocabulary of the table, stored like the sentences
+
+columns = dict(
+    cond = '<u1',
+    item = '<i4',
+    sentence_data = '|u1',
+    sentence_offsets = '<i8',
+    token_data = '<i4',
+    token_offsets = '<i8',
+    region_start = '<i4',
+    region_length = '<i4',
+    num = '<u1',
+    span_name = '<u1',
+    span_length = '<u2',
+    span_offsets = '<i8',
+    vocab_data = '|u1',
+    vocab_offsets = '<i8',
+)
+for field in fields:
+    columns[field] = '<i4'
+
+nums = ['singular', 'plural']
+span_names = []
+for cond in regions:
+    span_names += [name for name in regions[cond] if name not in span_names]
+
+
+# Same idea as writer.ListWriter: rows are buffered and appended to the column files in batches, all
+# under <fname>.cols.tmp, which only replaces <fname>.cols in commit().
+class ColumnWriter(object):
+    def __init__(self, fname, conds, batch_rows=10000):
+        self.path = fname + '.cols'
+        self.tmp = self.path + '.tmp'
+        self.conds = list(conds)
+        self.cond_ids = dict((cond, i) for i, cond in enumerate(self.conds))
+        self.batch_rows = batch_rows
+        self.vocab = {}
+        self.nrows = 0
+        self.nbytes = 0
+        self.ntokens = 0
+
+        if os.path.exists(self.tmp):
+            shutil.rmtree(self.tmp)
+        os.makedirs(self.tmp)
+        self.files = dict((name, open(os.path.join(self.tmp, name + '.bin'), 'wb')) for name in columns)
+        self.files['sentence_offsets'].write(np.zeros(1, dtype='<i8').tobytes())
+        self.files['token_offsets'].write(np.zeros(1, dtype='<i8').tobytes())
+        self.files['span_offsets'].write(np.zeros(1, dtype='<i8').tobytes())
+        self.nspans = 0
+        self.pending = self.empty()
+
+    def empty(self):
+        pending = dict((name, []) for name in ['cond', 'item', 'sentence', 'region_start', 'region_length', 'num', 'span_name', 'span_length', 'nspans'])
+        for field in fields:
+            pending[field] = []
+        return(pending)
+
+    def add(self, cond, item, sentence, start, length, num, lex, spans):
+        self.add_rows(cond, [item], [sentence], [start], [length], [num], dict((k, [lex[k]]) for k in fields), [spans])
+
+    # many rows of one condition. lex has a list of phrases for every field of items.Item, and spans
+    # the span lengths of every row, in the order of structures.regions[cond]
+    def add_rows(self, cond, items, sentences, starts, lengths, num_list, lex, spans):
+        p = self.pending
+        names = [span_names.index(name) for name in regions[cond]]
+        for row in spans:
+            p['span_name'] += names
+            p['span_length'] += list(row)
+            p['nspans'].append(len(names))
+        p['cond'] += [self.cond_ids[cond]] * len(sentences)
+        p['item'] += list(items)
+        p['sentence'] += list(sentences)
+        p['region_start'] += list(starts)
+        p['region_length'] += list(lengths)
+        p['num'] += [nums.index(x) for x in num_list]
+        for field in fields:
+            p[field] += [self.vocab.setdefault(x, len(self.vocab)) for x in lex[field]]
+        if len(p['sentence']) >= self.batch_rows:
+            self.flush()
+
+    def write_column(self, name, values):
+        self.files[name].write(np.asarray(values, dtype=columns[name]).tobytes())
+
+    def flush(self):
+        p = self.pending
+        if not p['sentence']:
+            return
+        for name in ['cond', 'item', 'region_start', 'region_length', 'num', 'span_name', 'span_length'] + list(fields):
+            self.write_column(name, p[name])
+        self.write_column('span_offsets', self.nspans + np.cumsum(p['nspans']))
+        self.nspans += sum(p['nspans'])
+
+        data = [s.encode('utf-8') for s in p['sentence']]
+        lens = np.array([len(s) for s in data], dtype=np.int64)
+        blob = np.frombuffer(b''.join(data), dtype=np.uint8)
+        self.files['sentence_data'].write(blob.tobytes())
+        ends = np.cumsum(lens)
+        self.write_column('sentence_offsets', self.nbytes + ends)
+
+        # words are separated by single spaces, so a word starts at the start of a sentence or after a space
+        starts = ends - lens
+        is_start = np.zeros(len(blob) + 1, dtype=bool)
+        is_start[starts[lens > 0]] = True
+        is_start[np.flatnonzero(blob == 32) + 1] = True
+        token_pos = np.flatnonzero(is_start[:len(blob)])
+        row = np.searchsorted(ends, token_pos, side='right')
+        self.write_column('token_data', token_pos - starts[row])
+        ntok = np.bincount(row, minlength=len(data))
+        self.write_column('token_offsets', self.ntokens + np.cumsum(ntok))
+
+        self.nbytes += int(ends[-1]) if len(ends) else 0
+        self.ntokens += len(token_pos)
+        self.nrows += len(data)
+        self.pending = self.empty()
+
+    def close_files(self):
+        self.flush()
+        words = sorted(self.vocab, key=self.vocab.get)
+        data = [w.encode('utf-8') for w in words]
+        self.files['vocab_data'].write(b''.join(data))
+        self.write_column('vocab_offsets', np.cumsum([0] + [len(w) for w in data]))
+        for name in columns:
+            self.files[name].flush()
+            os.fsync(self.files[name].fileno())
+            self.files[name].close()
+        self.files = {}
+        meta = dict(nrows=self.nrows, conds=self.conds, columns=columns, fields=list(fields), spans=span_names, regions=dict((cond, regions[cond]) for cond in self.conds))
+        with open(os.path.join(self.tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1, sort_keys=True)
+
+    def commit(self):
+        self.close_files()
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        for name in list(self.files.keys()):
+            self.files[name].close()
+        self.files = {}
+        if os.path.exists(self.tmp):
+            shutil.rmtree(self.tmp)
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return(False)
+
+
+# A table written by ColumnWriter. table[name] is the memory-mapped column.
+class ColumnTable(object):
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.conds = self.meta['conds']
+        self.nrows = self.meta['nrows']
+        self.arrays = {}
+        for name, dtype in self.meta['columns'].items():
+            fname = os.path.join(path, name + '.bin')
+            if os.path.getsize(fname) == 0:
+                self.arrays[name] = np.zeros(0, dtype=dtype)
+            else:
+                self.arrays[name] = np.memmap(fname, dtype=dtype, mode='r')
+        offsets = self.arrays['vocab_offsets']
+        data = self.arrays['vocab_data']
+        self.vocab = [bytes(data[offsets[i]:offsets[i+1]]).decode('utf-8') for i in range(len(offsets)-1)]
+
+    def __getitem__(self, name):
+        return(self.arrays[name])
+
+    def __len__(self):
+        return(self.nrows)
+
+    # row numbers of one condition
+    def rows(self, cond):
+        return(np.flatnonzero(self.arrays['cond'] == self.conds.index(cond)))
+
+    def sentence(self, i):
+        offsets = self.arrays['sentence_offsets']
+        return(bytes(self.arrays['sentence_data'][offsets[i]:offsets[i+1]]).decode('utf-8'))
+
+    # byte offsets of the words of row i within its sentence
+    def tokens(self, i):
+        offsets = self.arrays['token_offsets']
+        return(self.arrays['token_data'][offsets[i]:offsets[i+1]])
+
+    def phrase(self, field, i):
+        return(self.vocab[self.arrays[field][i]])
+
+    # (name, first word, number of words) of every span of row i
+    def spans(self, i):
+        offsets = self.arrays['span_offsets']
+        names = self.arrays['span_name'][offsets[i]:offsets[i+1]]
+        lengths = self.arrays['span_length'][offsets[i]:offsets[i+1]].astype(np.int64)
+        starts = np.cumsum(lengths) - lengths
+        return([(self.meta['spans'][n], int(s), int(l)) for n, s, l in zip(names, starts, lengths)])
+
+    # Every span of the table as arrays: its row, name (index into meta['spans']), first token (as an
+    # index into the tokens of the whole table, like token_data) and number of tokens
+    def span_index(self):
+        lengths = self.arrays['span_length'].astype(np.int64)
+        offsets = self.arrays['span_offsets']
+        row = np.repeat(np.arange(self.nrows), np.diff(offsets))
+        # the spans of a row cover its tokens in order, so the spans of the table cover all its tokens
+        starts = np.cumsum(lengths) - lengths
+        return(row, np.asarray(self.arrays['span_name']), starts, lengths)
+
+    # Sum of values (one per token of the table, e.g. the surprisal of every word) over every span, in
+    # the order of span_index(). Spans of 0 words sum to 0.
+    def span_sums(self, values):
+        row, name, starts, lengths = self.span_index()
+        if len(values) == 0:
+            return(np.zeros(len(starts)))
+        sums = np.add.reduceat(np.asarray(values, dtype=np.float64), np.minimum(starts, len(values) - 1))
+        sums[lengths == 0] = 0
+        return(sums)
+
+    # Span of the given name in every row: its first word (within the sentence, like region_start) and
+    # its number of words. Rows where it is empty or missing get -1. For the adverbs, which have two
+    # places, the one that is not empty is taken.
+    def region(self, name):
+        row, names, starts, lengths = self.span_index()
+        first = np.full(self.nrows, -1, dtype=np.int64)
+        length = np.full(self.nrows, -1, dtype=np.int64)
+        pick = (names == self.meta['spans'].index(name)) & (lengths > 0)
+        first[row[pick]] = starts[pick] - self.arrays['token_offsets'][row[pick]]
+        length[row[pick]] = lengths[pick]
+        return(first, length)
@@ -1,12 +1,27 @@
 import random
-random.seed(7)
-import copy
 import os
+import hashlib
+import json
+import itertools
+import multiprocessing
 from classes import all_noun_classes
 from classes import all_verbs
 from classes import adjectives
 from classes import adverbs
-from classes import plurals
+from lexicon import lexicon
+from writer import ListWriter
+from writer import print_report
+from structures import render
+from structures import conds
+from items import Item
+from feasibility import FeasibilityIndex
+from checkpoint import Checkpoint
+from agreement import item_numbers
+from agreement import coord_numbers
+from agreement import inflect
+from agreement import agree_by_phrase
+from instrument import stats
+from instrument import print_stats
 
 def flatten(l):
     if isinstance(l[0], list):
@@ -50,6 +65,8 @@ def get_adj(c, noun_classes, adj_classes, l):
                     break
             if found_adj:
                 break
+        if not found_adj:
+            stats.count('adjective_misses')
     else:
         adj = ''
     return(adj)
@@ -70,164 +87,67 @@ def get_adv(verb, verb_classes, adv_classes, l):
                     break
             if found_adv:
                 break
+        if not found_adv:
+            stats.count('adverb_misses')
     else:
         adv = ''
     return(adv)
 
 
-def pluralize(noun):
-    if random.randint(0,4) < 2:
-        return(plurals[noun], 'plural')
-    else:
-        return(noun, 'singular')
+def get_num(phrase):
+    num = lexicon.get_num(phrase)
+    if num is None:
+        stats.event('word_not_found', "DID NOT FIND WORD")
+    return(num)
 
 # To do: Add a table: is human? which for every noun specifies if it is human
 def create_sents(args):  #for one sentence]
     # If noun is plural, change was to were
-    if str.split(args['obj'])[-1] in plurals.keys(): #i.e. it is singular
+    if lexicon.get_num(args['obj']) == 'singular':
         was = 'was'
     else:
         was = 'were'
 
     # If the adverb was time, then we want it to come post-verbally
-    rc_adv = args['rc_adv'].strip() in adverbs['time']
-    subjmv_adv = args['subjmv_adv'].strip() in adverbs['time']
-    objmv_adv = args['objmv_adv'].strip() in adverbs['time']
-
-    #print(args['obj'], len(str.split(args['obj'])))
+    rc_adv = lexicon.is_time_adv(args['rc_adv'])
+    subjmv_adv = lexicon.is_time_adv(args['subjmv_adv'])
+    objmv_adv = lexicon.is_time_adv(args['objmv_adv'])
 
     if random.random() > 0.33:
         coord = False
     else:
         coord = True
 
-    nwords_subj = len(str.split(args['subj']))
-    nwords_obj = len(str.split(args['obj']))
-    nwords_rcadv = len(str.split(args['rc_adv']))
-    nwords_verb = len(str.split(args['verb']))
-    nwords_subjmvadv = len(str.split(args['subjmv_adv']))
-    nwords_subjmv = len(str.split(args['subj_mv']))
-    nwords_obj2 = len(str.split(args['obj2']))
-    nwords_objmvadv = len(str.split(args['objmv_adv']))
-    nwords_objmv = len(str.split(args['verb']))
-    nwords_byphrase = len(str.split(args['by_phrase']))
-    nwords_subj_coord = len(str.split(args['subj_coord']))
-    nwords_obj_coord = len(str.split(args['obj_coord']))
-
-    #print(nwords_subj_coord, nwords_obj_coord)
-
-    subj_noun = str.split(args['subj'])[-1]
-    if subj_noun in plurals.keys():
-        subj_noun_num = 'singular'
-    elif subj_noun in plurals.values():
-        subj_noun_num = 'plural'
-    else:
-        print("DID NOT FIND WORD")
-
-
-    obj_noun = str.split(args['obj'])[-1]
-    if obj_noun in plurals.keys():
-        obj_noun_num = 'singular'
-    elif obj_noun in plurals.values():
-        obj_noun_num = 'plural'
-    else:
-        print("DID NOT FIND WORD")
-
-    obj2_noun = str.split(args['obj2'])[-1]
-    if obj2_noun in plurals.keys():
-        obj2_noun_num = 'singular'
-    elif obj2_noun in plurals.values():
-        obj2_noun_num = 'plural'
-    else:
-        print("DID NOT FIND WORD")
+    subj_noun_num = get_num(args['subj'])
+    obj_noun_num = get_num(args['obj'])
+    obj2_noun_num = get_num(args['obj2'])
 
-    obj3_noun = str.split(args['obj3'])[-1]
-    if obj3_noun in plurals.keys():
-        obj3_noun_num = 'singular'
-    elif obj3_noun in plurals.values():
-        obj3_noun_num = 'plural'
-    else:
-        print("DID NOT FIND WORD")
-
-    # print(subj_noun, subj_noun_num)
-    # print(obj_noun, obj_noun_num)
-    # print(obj2_noun, obj2_noun_num)
-    # print(str.split(args['subj'])[0],str.split(args['obj'])[0],str.split(args['obj2'])[0])
-
-    if not coord:
-        if subj_noun_num == 'singular':
-            that_noun = 'subj'
-        elif obj3_noun_num == 'singular':
-            that_noun = 'obj3'
-        elif obj_noun_num == 'singular': 
-            that_noun = 'obj'
-        else:
-            that_noun = 0
+    # create_set always makes obj3 singular (see agreement.py), so it can take "that" when the subject cannot
+    if subj_noun_num == 'singular':
+        that_noun = 'subj_coord' if coord else 'subj'
     else:
-        if subj_noun_num == 'singular':
-            that_noun = 'subj_coord'
-        elif obj3_noun_num == 'singular':
-            that_noun = 'obj3'
-        elif obj_noun_num == 'singular': 
-            that_noun = 'obj_coord'
-        else:
-            that_noun = 0
-
-    if that_noun == 0:
-        print("SENTENCE WITHOUT THAT CREATED")
+        that_noun = 'obj3'
 
-    #print(args[that_noun])
+    args = dict(args)
+    args['was'] = was
 
+    # The "that" versions only differ from the item in one or two phrases. Only those are worked out
+    # and then laid over a shallow copy of the item.
     # used for ORC, PRC, OCONT
-    args_that = copy.deepcopy(args)
-    to_change_sent = str.split(args_that[that_noun])
+    to_change_sent = str.split(args[that_noun])
     to_change_sent[0] = 'that'
+    args_that = dict(args)
     args_that[that_noun] = ' '.join(to_change_sent)
 
-
     # used for SCONT
-    args_that2 = copy.deepcopy(args_that)
+    args_that2 = args_that
     if that_noun == 'obj3':
-        if obj2_noun_num == 'singular':
-            to_change_sent = str.split(args_that2['obj2'])
-            to_change_sent[0] = 'that'
-            args_that2['obj2'] = ' '.join(to_change_sent)
-        else: #i.e. the only option is plural, so need to change to sing
-            to_change_sent = str.split(args_that2['obj2'])
-            to_change_sent[0] = 'that'
-            to_change_sent[-1] = list(plurals.keys())[list(plurals.values()).index(to_change_sent[-1])]   #this gets the singular of the plural form. 
-            args_that2['obj2'] = ' '.join(to_change_sent)
-
-
-    src_startpos = nwords_subj 
-    orc_startpos = nwords_obj
-    orrc_startpos = nwords_obj
-    prc_startpos = nwords_obj
-    prrc_startpos = nwords_obj
-    ocont_len = 1
-    scont_len = 1
-
-    if not coord:
-        src_rclen = 1 + nwords_rcadv + nwords_verb + nwords_obj 
-        orc_rclen = 1 + nwords_subj + nwords_rcadv + nwords_verb
-        orrc_rclen = nwords_subj + nwords_rcadv + nwords_verb 
-        prc_rclen = 2 + nwords_rcadv + nwords_verb + 1 + nwords_subj
-        prrc_rclen = nwords_rcadv + nwords_verb + 1 + nwords_subj
-
-        ocont_andpos = nwords_obj + nwords_rcadv + nwords_verb + nwords_subj
-        ocont_len = 1
-
-        scont_andpos = nwords_subj + nwords_rcadv + nwords_verb + nwords_obj
-        scont_len = 1
-    else:
-        src_rclen = 1 + nwords_rcadv + nwords_verb + nwords_obj_coord 
-        orc_rclen = 1 + nwords_subj_coord + nwords_rcadv + nwords_verb
-        orrc_rclen = nwords_subj_coord + nwords_rcadv + nwords_verb 
-        prc_rclen = 2 + nwords_rcadv + nwords_verb + 1 + nwords_subj_coord
-        prrc_rclen = nwords_rcadv + nwords_verb + 1 + nwords_subj_coord
-
-        ocont_andpos = nwords_obj + nwords_rcadv + nwords_verb + nwords_subj_coord
-        scont_andpos = nwords_subj + nwords_rcadv + nwords_verb + nwords_obj_coord
+        to_change_sent = str.split(args['obj2'])
+        to_change_sent[0] = 'that'
+        if obj2_noun_num != 'singular': #i.e. the only option is plural, so need to change to sing
+            to_change_sent[-1] = lexicon.singular[to_change_sent[-1]]
+        args_that2 = dict(args_that)
+        args_that2['obj2'] = ' '.join(to_change_sent)
 
     if rc_adv and (subjmv_adv or objmv_adv):
         adv_pos = 3
@@ -241,619 +161,335 @@ def create_sents(args):  #for one sentence]
     #for debugging
     adv_pos = 2
 
-    if adv_pos == 0:  # RC adv first, MV adv first
-        #print(args['by_phrase'])
-        if not coord:
-            src = '%s that%s %s %s%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-
-            orc = '%s that %s%s %s%s %s %s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc = '%s %s%s %s%s %s %s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prc = '%s that %s%s %s by %s%s %s %s .'%(args['obj'], was, args['rc_adv'], args['verb'], args['subj'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prrc = '%s%s %s by %s%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont = '%s%s %s %s and%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont = '%s%s %s %s and%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orrc_that = '%s %s%s %s%s %s %s .'%(args_that['obj'], args_that['subj'], args_that['rc_adv'], args_that['verb'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            prrc_that = '%s%s %s by %s%s %s %s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            ocont_that = '%s%s %s %s and%s %s %s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            scont_that = '%s%s %s %s and%s %s %s .'%(args_that2['subj'], args_that2['rc_adv'], args_that2['verb'], args_that2['obj'], args_that2['subjmv_adv'], args_that2['subj_mv'], args_that2['obj2'])
-
-            src_by = '%s that%s %s %s %s%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['by_phrase'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orc_by = '%s that %s%s %s %s%s %s %s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc_by = '%s %s%s %s %s%s %s %s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont_by = '%s%s %s %s %s and%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['by_phrase'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            ocont_by = '%s%s %s %s %s and%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'],  args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-        else:
-            src = '%s that%s %s %s%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-
-            orc = '%s that %s%s %s%s %s %s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc = '%s %s%s %s%s %s %s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prc = '%s that %s%s %s by %s%s %s %s .'%(args['obj'], was, args['rc_adv'], args['verb'], args['subj_coord'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prrc = '%s%s %s by %s%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont = '%s%s %s %s and%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont = '%s%s %s %s and%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orrc_that = '%s %s%s %s%s %s %s .'%(args_that['obj'], args_that['subj_coord'], args_that['rc_adv'], args_that['verb'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            prrc_that = '%s%s %s by %s%s %s %s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj_coord'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            ocont_that = '%s%s %s %s and%s %s %s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj_coord'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            scont_that = '%s%s %s %s and%s %s %s .'%(args_that2['subj'], args_that2['rc_adv'], args_that2['verb'], args_that2['obj_coord'], args_that2['subjmv_adv'], args_that2['subj_mv'], args_that2['obj2'])
-
-            src_by = '%s that%s %s %s %s%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['by_phrase'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orc_by = '%s that %s%s %s %s%s %s %s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc_by = '%s %s%s %s %s%s %s %s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont_by = '%s%s %s %s %s and%s %s %s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['by_phrase'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            ocont_by = '%s%s %s %s %s and%s %s %s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'],  args['by_phrase'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-
-    elif adv_pos == 1:  # RC adv second, MV adv first
-        if not coord:
-            src = '%s that %s %s%s%s %s %s .'%(args['subj'], args['verb'], args['obj'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orc = '%s that %s %s%s%s %s %s .'%(args['obj'], args['subj'], args['verb'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc = '%s %s %s%s%s %s %s .'%(args['obj'], args['subj'], args['verb'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prc = '%s that %s %s by %s%s%s %s %s .'%(args['obj'], was, args['verb'], args['subj'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prrc = '%s %s by %s%s%s %s %s .'%(args['obj'], args['verb'], args['subj'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont = '%s %s %s%s and%s %s %s .'%(args['obj'], args['verb'], args['subj'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont = '%s %s %s%s and%s %s %s .'%(args['subj'], args['verb'], args['obj'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orrc_that = '%s %s %s%s%s %s %s .'%(args_that['obj'], args_that['subj'], args_that['verb'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            prrc_that = '%s %s by %s%s%s %s %s .'%(args_that['obj'], args_that['verb'], args_that['subj'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            ocont_that = '%s %s %s%s and%s %s %s .'%(args_that['obj'], args_that['verb'], args_that['subj'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            scont_that = '%s %s %s%s and%s %s %s .'%(args_that2['subj'], args_that2['verb'], args_that2['obj'], args_that2['rc_adv'], args_that2['subjmv_adv'], args_that2['subj_mv'], args_that2['obj2'])
-
-            src_by = '%s that %s %s %s%s%s %s %s .'%(args['subj'], args['verb'], args['obj'], args['by_phrase'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2']) 
-
-            orc_by = '%s that %s %s %s%s%s %s %s .'%(args['obj'], args['subj'], args['verb'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc_by = '%s %s %s %s%s%s %s %s .'%(args['obj'], args['subj'], args['verb'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont_by = '%s %s %s %s%s and%s %s %s .'%(args['obj'], args['verb'], args['subj'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont_by = '%s %s %s %s%s and%s %s %s .'%(args['subj'], args['verb'], args['obj'], args['by_phrase'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-        else:
-            src = '%s that %s %s%s%s %s %s .'%(args['subj'], args['verb'], args['obj_coord'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orc = '%s that %s %s%s%s %s %s .'%(args['obj'], args['subj_coord'], args['verb'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc = '%s %s %s%s%s %s %s .'%(args['obj'], args['subj_coord'], args['verb'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prc = '%s that %s %s by %s%s%s %s %s .'%(args['obj'], was, args['verb'], args['subj_coord'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            prrc = '%s %s by %s%s%s %s %s .'%(args['obj'], args['verb'], args['subj_coord'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont = '%s %s %s%s and%s %s %s .'%(args['obj'], args['verb'], args['subj_coord'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont = '%s %s %s%s and%s %s %s .'%(args['subj'], args['verb'], args['obj_coord'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])
-
-            orrc_that = '%s %s %s%s%s %s %s .'%(args_that['obj'], args_that['subj_coord'], args_that['verb'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            prrc_that = '%s %s by %s%s%s %s %s .'%(args_that['obj'], args_that['verb'], args_that['subj_coord'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            ocont_that = '%s %s %s%s and%s %s %s .'%(args_that['obj'], args_that['verb'], args_that['subj_coord'], args_that['rc_adv'], args_that['objmv_adv'], args_that['obj_mv'], args_that['obj3'])
-
-            scont_that = '%s %s %s%s and%s %s %s .'%(args_that2['subj'], args_that2['verb'], args_that2['obj_coord'], args_that2['rc_adv'], args_that2['subjmv_adv'], args_that2['subj_mv'], args_that2['obj2'])
-
-            src_by = '%s that %s %s %s%s%s %s %s .'%(args['subj'], args['verb'], args['obj_coord'], args['by_phrase'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2']) 
-
-            orc_by = '%s that %s %s %s%s%s %s %s .'%(args['obj'], args['subj_coord'], args['verb'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            orrc_by = '%s %s %s %s%s%s %s %s .'%(args['obj'], args['subj_coord'], args['verb'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            ocont_by = '%s %s %s %s%s and%s %s %s .'%(args['obj'], args['verb'], args['subj_coord'], args['by_phrase'], args['rc_adv'], args['objmv_adv'], args['obj_mv'], args['obj3'])
-
-            scont_by = '%s %s %s %s%s and%s %s %s .'%(args['subj'], args['verb'], args['obj_coord'], args['by_phrase'], args['rc_adv'], args['subjmv_adv'], args['subj_mv'], args['obj2'])            
-
-
-    elif adv_pos == 2:  # RC adv first, MV adv second
-        if not coord:
-            src = '%s that%s %s %s %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-            orc = '%s that %s%s %s %s %s%s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            orrc = '%s %s%s %s %s %s%s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            prc = '%s that %s%s %s by %s %s %s%s .'%(args['obj'], was, args['rc_adv'], args['verb'], args['subj'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            prrc = '%s%s %s by %s %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            ocont = '%s%s %s %s and %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            scont = '%s%s %s %s and %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
+    # the "that" versions have the same number of words in every slot
+    nwords = dict((key, len(str.split(args[key]))) for key in args)
 
-            orrc_that = '%s %s%s %s %s %s%s .'%(args_that['obj'], args_that['subj'], args_that['rc_adv'], args_that['verb'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            prrc_that = '%s%s %s by %s %s %s%s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            ocont_that = '%s%s %s %s and %s %s%s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            scont_that = '%s%s %s %s and %s %s%s .'%(args_that2['subj'], args_that2['rc_adv'], args_that2['verb'], args_that2['obj'], args_that2['subj_mv'], args_that2['obj2'], args_that2['subjmv_adv'])
-
-            src_by = '%s that%s %s %s %s %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['by_phrase'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-            orc_by = '%s that %s%s %s %s %s %s%s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            orrc_by = '%s %s%s %s %s %s %s%s .'%(args['obj'], args['subj'], args['rc_adv'], args['verb'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            ocont_by = '%s%s %s %s %s and %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            scont_by = '%s%s %s %s %s and %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj'], args['by_phrase'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-        else:
-            src = '%s that%s %s %s %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-            orc = '%s that %s%s %s %s %s%s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            orrc = '%s %s%s %s %s %s%s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            prc = '%s that %s%s %s by %s %s %s%s .'%(args['obj'], was, args['rc_adv'], args['verb'], args['subj_coord'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            prrc = '%s%s %s by %s %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            ocont = '%s%s %s %s and %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            scont = '%s%s %s %s and %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-            orrc_that = '%s %s%s %s %s %s%s .'%(args_that['obj'], args_that['subj_coord'], args_that['rc_adv'], args_that['verb'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            prrc_that = '%s%s %s by %s %s %s%s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj_coord'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            ocont_that = '%s%s %s %s and %s %s%s .'%(args_that['obj'], args_that['rc_adv'], args_that['verb'], args_that['subj_coord'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-            scont_that = '%s%s %s %s and %s %s%s .'%(args_that2['subj'], args_that2['rc_adv'], args_that2['verb'], args_that2['obj_coord'], args_that2['subj_mv'], args_that2['obj2'], args_that2['subjmv_adv'])
-
-            src_by = '%s that%s %s %s %s %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['by_phrase'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-            orc_by = '%s that %s%s %s %s %s %s%s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            orrc_by = '%s %s%s %s %s %s %s%s .'%(args['obj'], args['subj_coord'], args['rc_adv'], args['verb'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            ocont_by = '%s%s %s %s %s and %s %s%s .'%(args['obj'], args['rc_adv'], args['verb'], args['subj_coord'], args['by_phrase'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-            scont_by = '%s%s %s %s %s and %s %s%s .'%(args['subj'], args['rc_adv'], args['verb'], args['obj_coord'], args['by_phrase'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-
-    else: # RC adv second, MV adv second
-        src = '%s that %s %s%s %s %s%s .'%(args['subj'], args['verb'], args['obj'], args['rc_adv'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-        orc = '%s that %s %s%s %s %s%s .'%(args['obj'], args['subj'], args['verb'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        orrc = '%s %s %s%s %s %s%s .'%(args['obj'], args['subj'], args['verb'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        prc = '%s that %s %s by %s%s %s %s%s .'%(args['obj'], was, args['verb'], args['subj'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        prrc = '%s %s by %s%s %s %s%s .'%(args['obj'], args['verb'], args['subj'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        ocont = '%s %s %s%s and %s %s%s .'%(args['obj'], args['verb'], args['subj'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        scont = '%s %s %s%s and %s %s%s .'%(args['subj'], args['verb'], args['obj'], args['rc_adv'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-        orrc_that = '%s %s %s%s %s %s%s .'%(args_that['obj'], args_that['subj'], args_that['verb'], args_that['rc_adv'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-        prrc_that = '%s %s by %s%s %s %s%s .'%(args_that['obj'], args_that['verb'], args_that['subj'], args_that['rc_adv'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-        ocont_that = '%s %s %s%s and %s %s%s .'%(args_that['obj'], args_that['verb'], args_that['subj'], args_that['rc_adv'], args_that['obj_mv'], args_that['obj3'], args_that['objmv_adv'])
-
-        scont_that = '%s %s %s%s and %s %s%s .'%(args_that2['subj'], args_that2['verb'], args_that2['obj'], args_that2['rc_adv'], args_that2['subj_mv'], args_that2['obj2'], args_that2['subjmv_adv'])
-
-        src_by = '%s that %s %s %s%s %s %s%s .'%(args['subj'], args['verb'], args['obj'], args['by_phrase'], args['rc_adv'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-        orc_by = '%s that %s %s %s%s %s %s%s .'%(args['obj'], args['subj'], args['verb'], args['by_phrase'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        orrc_by = '%s %s %s %s%s %s %s%s .'%(args['obj'], args['subj'], args['verb'], args['by_phrase'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        ocont_by = '%s %s %s %s%s and %s %s%s .'%(args['obj'], args['verb'], args['subj'], args['by_phrase'], args['rc_adv'], args['obj_mv'], args['obj3'], args['objmv_adv'])
-
-        scont_by = '%s %s %s %s%s and %s %s%s .'%(args['subj'], args['verb'], args['obj'], args['by_phrase'], args['rc_adv'], args['subj_mv'], args['obj2'], args['subjmv_adv'])
-
-
-
-
-    # print(prrc)
-    # print(prrc_that)
-    # print(orrc)
-    # print(orrc_that)
-    # print('#######')
-    return({
-        'src': [src, src_startpos, src_rclen, subj_noun_num],
-        'orc':[orc, orc_startpos, orc_rclen, obj_noun_num],
-        'orrc':[orrc, orrc_startpos, orrc_rclen, obj_noun_num],
-        'prc':[prc, prc_startpos, prc_rclen, obj_noun_num],
-        'prrc':[prrc, prrc_startpos, prrc_rclen, obj_noun_num],
-        'ocont': [ocont, ocont_andpos, ocont_len, obj_noun_num],
-        'scont': [scont, scont_andpos, scont_len, subj_noun_num],
-        'orrc_that': [orrc_that, orrc_startpos, orrc_rclen, obj_noun_num],
-        'prrc_that':[prrc_that, prrc_startpos, prrc_rclen, obj_noun_num],
-        'ocont_that': [ocont_that, ocont_andpos, ocont_len, obj_noun_num],
-        'scont_that': [scont_that, scont_andpos, scont_len, subj_noun_num],
-        'src_by': [src_by, src_startpos, src_rclen+nwords_byphrase, subj_noun_num],
-        'orc_by':[orc_by, orc_startpos, orc_rclen+nwords_byphrase, obj_noun_num],
-        'orrc_by':[orrc_by, orrc_startpos, orrc_rclen+nwords_byphrase, obj_noun_num],
-        'ocont_by': [ocont_by, ocont_andpos+nwords_byphrase, ocont_len+nwords_byphrase, obj_noun_num],
-        'scont_by': [scont_by, scont_andpos+nwords_byphrase, scont_len+nwords_byphrase, subj_noun_num]
-        })
+    return(render(adv_pos, coord, [args, args_that, args_that2], nwords, {'subj': subj_noun_num, 'obj': obj_noun_num}))
     
 
 #print(list(verbs.keys())[0:10])
 
-def get_mv(class_list, verbs_used, verb_list, noun_classes):
-    random.shuffle(class_list)
-    found_mv = False
-
-    for i in range(len(class_list)): #by the end of the loop I will have an mv and subj/obj class if it is possible to have it. 
-        c = class_list[i]
-        mv_list = noun_classes[c][1]
-        random.shuffle(mv_list)
-        for verb in mv_list:
-            if verb in verb_list and verb not in verbs_used:  #if I can find mv for a class that has not been used, I am done
-                mv = verb
-                found_mv = True 
-                break
-        if found_mv:
-            break
-    if not found_mv:
-        return([0,0])
-    else:
-        return([c, mv])
-
-
-def get_classes(verb, verbs_used, verb_list, noun_classes):
-    subj_classes = verb[0]
-    subj_class, subj_mv = get_mv(subj_classes, verbs_used, verb_list, noun_classes) 
-
-    obj_classes = verb[1]
-    obj_class, obj_mv = get_mv(obj_classes, verbs_used, verb_list, noun_classes)
-
-    return(subj_class, subj_mv, obj_class, obj_mv)
-
-
-def create_set(verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, n):
-    verb_list = list(verb_classes.keys())
-    args_list = [] 
-    verbs_used = set()  
-    nouns_used = set()
-    adjs_used = set()
-    advs_used = set()
-
-    # verb_ind = 0  # having this here does not allow for verb repetition
-    # random.shuffle(verb_list)
-    for i in range(n):
-        random.shuffle(verb_list)
-        #print(i,len(verb_list))
-        #print(i)
-        verb_ind = 0  
-        subj_class, subj_mv, obj_class, obj_mv = 0,0,0,0
-
-        found_verb = False
-
-        while not found_verb and verb_ind < len(verb_list):
-            verb = verb_list[verb_ind]
-            verb_ind +=1
-            if verb not in verbs_used:
-                verbs_used.add(verb)
-            subj_class, subj_mv, obj_class, obj_mv = get_classes(verb_classes[verb], verbs_used, verb_list, noun_classes)
-            if subj_mv != 0 and obj_mv != 0:
-                found_verb = True
-                verbs_used.add(subj_mv)
-                verbs_used.add(obj_mv)
+# The items of a set, made one at a time: iterating over an ItemStream yields every item as soon as it is
+# made, so a set of any size can be written out (see make_files) without holding its items. verbs_used,
+# nouns_used, adjs_used and advs_used are the words of the items made so far, which the test set of a
+# list must not use (see get_test_classes). The items are Items (see items.py) by default; record=dict
+# gives plain dicts, which do not add their phrases to the phrase table, for items that are not kept.
+#
+# With a checkpoint (see checkpoint.py), the state is saved every checkpoint.every items as the given
+# stage, with the items made since the last save, and a stopped run carries on from the last save; the
+# classes then come from the saved state and the stream starts at the item it was saved at.
+class ItemStream(object):
+    def __init__(self, verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, n, checkpoint=None, stage=None, record=Item):
+        self.n = n
+        self.record = record
+        self.checkpoint = checkpoint
+        self.stage = stage
+        self.resumed = checkpoint.resume(stage) if checkpoint is not None else None
+        if self.resumed is not None:
+            verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, feasible, nouns_used, adjs_used, advs_used = self.resumed['sets']
+            self.start = self.resumed['i']
+        else:
+            feasible = FeasibilityIndex(verb_classes, noun_classes, by_phrases)
+            nouns_used = set()
+            adjs_used = set()
+            advs_used = set()
+            self.start = 0
+        self.sets = (verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, feasible, nouns_used, adjs_used, advs_used)
+        self.verbs_used = feasible.used
+        self.nouns_used = nouns_used
+        self.adjs_used = adjs_used
+        self.advs_used = advs_used
+
+    def __iter__(self):
+        verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, feasible, nouns_used, adjs_used, advs_used = self.sets
+        checkpoint, stage = self.checkpoint, self.stage
+        pending = []  # made since the last save
+
+        for i in range(self.start, self.n):
+            if checkpoint is not None and checkpoint.due(i, self.resumed):
+                checkpoint.add_items(stage, pending)
+                pending = []
+                checkpoint.save(stage, i=i, sets=self.sets)
+            stats.mark()
+            verb, subj_class, subj_mv, obj_class, obj_mv = feasible.draw()
+            stats.lap('verb')
+
+            subj_det, obj_det = get_det(subj_class, obj_class)
+            #print(subj_class)
+            # if subj_class not in noun_classes:
+            #     print(subj_class)
+            # if len(flatten(noun_classes[subj_class])) < 1:
+            #     print(flatten(noun_classes[subj_class]), subj_class)
+            subj_list =  flatten(noun_classes[subj_class][0])
+            subj = subj_list[random.randint(0, len(subj_list)-1)]
+
+
+            obj_list =  flatten(noun_classes[obj_class][0])
+            obj = subj
+            if len(obj_list) > 1:  #if its possible to have different subject and object, do that. 
+                while obj == subj:
+                    obj = obj_list[random.randint(0, len(obj_list)-1)]
+
+
+        # Get object for MV when subject is subject of RC
+            obj2_classes = list(feasible.object_classes[subj_mv])
+
+            random.shuffle(obj2_classes)
+            obj2 = obj
+            if len(obj2_classes) > 1: 
+                while obj2 in [subj, obj]:
+                    stats.count('obj2_class_tries')
+                    obj2_class = obj2_classes.pop()
+                    for item in noun_classes[obj2_class][0]:
+                        if item not in [subj, obj]:
+                            obj2 = item
+                            break
             else:
-                verbs_used.remove(verb)
-
-
-        subj_det, obj_det = get_det(subj_class, obj_class)
-        #print(subj_class)
-        # if subj_class not in noun_classes:
-        #     print(subj_class)
-        # if len(flatten(noun_classes[subj_class])) < 1:
-        #     print(flatten(noun_classes[subj_class]), subj_class)
-        subj_list =  flatten(noun_classes[subj_class][0])
-        subj = subj_list[random.randint(0, len(subj_list)-1)]
-
-
-        obj_list =  flatten(noun_classes[obj_class][0])
-        obj = subj
-        if len(obj_list) > 1:  #if its possible to have different subject and object, do that. 
-            while obj == subj:
-                obj = obj_list[random.randint(0, len(obj_list)-1)]
-
-
-    # Get object for MV when subject is subject of RC
-        obj2_classes = copy.deepcopy(flatten(verb_classes[subj_mv][1]))
-
-        random.shuffle(obj2_classes)
-        obj2 = obj
-        if len(obj2_classes) > 1: 
-            while obj2 in [subj, obj]:
-                obj2_class = obj2_classes.pop()
+                obj2_class = obj2_classes[0]
                 for item in noun_classes[obj2_class][0]:
                     if item not in [subj, obj]:
                         obj2 = item
                         break
-        else:
-            obj2_class = obj2_classes[0]
-            for item in noun_classes[obj2_class][0]:
-                if item not in [subj, obj]:
-                    obj2 = item
-                    break
 
 
-        _, obj2_det = get_det(subj_class, obj2_class)
+            _, obj2_det = get_det(subj_class, obj2_class)
         
 
-        obj3_classes = copy.deepcopy(flatten(verb_classes[obj_mv][1]))
-        random.shuffle(obj3_classes)
-        obj3 = obj
-        if len(obj3_classes) > 1:
-            while obj3 in [subj, obj]:
-                obj3_class = obj3_classes.pop()
+            obj3_classes = list(feasible.object_classes[obj_mv])
+            random.shuffle(obj3_classes)
+            obj3 = obj
+            if len(obj3_classes) > 1:
+                while obj3 in [subj, obj]:
+                    stats.count('obj3_class_tries')
+                    obj3_class = obj3_classes.pop()
+                    for item in noun_classes[obj3_class][0]:
+                        if item not in [subj, obj]:
+                            obj3 = item
+                            break
+            else:
+                obj3_class = obj3_classes[0]
                 for item in noun_classes[obj3_class][0]:
                     if item not in [subj, obj]:
                         obj3 = item
                         break
-        else:
-            obj3_class = obj3_classes[0]
-            for item in noun_classes[obj3_class][0]:
-                if item not in [subj, obj]:
-                    obj3 = item
-                    break
-
-        _, obj3_det = get_det(obj_class, obj3_class)
 
+            _, obj3_det = get_det(obj_class, obj3_class)
+            stats.lap('nouns')
         
 
-        subj_adj = get_adj(subj_class, noun_classes, adj_classes, [])
-        obj_adj = get_adj(obj_class, noun_classes, adj_classes, [subj_adj])
-        obj2_adj = get_adj(obj2_class, noun_classes, adj_classes, [subj_adj, obj_adj])
-        obj3_adj = get_adj(obj3_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj2_adj])   #does this make it more likely that obj3 will not have adjs? 
-        #print(subj, obj, obj2, obj3)
-
-
-        nouns_used.add(subj)
-        nouns_used.add(obj)
-        nouns_used.add(obj2)
-        nouns_used.add(obj3)
-
-        if subj_adj != '': 
-            adjs_used.add(str.split(subj_adj)[-1])
-        if obj_adj != '': 
-            adjs_used.add(str.split(obj_adj)[-1])
-        if obj2_adj != '': 
-            adjs_used.add(str.split(obj2_adj)[-1])
-        if obj3_adj != '': 
-            adjs_used.add(str.split(obj3_adj)[-1])
-
-        subj_noun, subj_num = pluralize(subj)
-        obj_noun, obj_num = pluralize(obj)
-        obj2_noun, obj2_num = pluralize(obj2)
-        obj3_noun, obj3_num = pluralize(obj3)
-
-        # This ensures at least subj, obj or obj3 are plural. This is important for the "orrc_that" and "prrc_that" control sentences. If all are plural, we cannot have "that" in the sentence. 
-        while subj_num == 'plural' and obj_num == 'plural' or obj3_num == 'plural':
-            subj_noun, subj_num = pluralize(subj)
-            obj_noun, obj_num = pluralize(obj)
-            obj2_noun, obj2_num = pluralize(obj2)
-            obj3_noun, obj3_num = pluralize(obj3)
-
-
-        subj = '%s%s %s'%(subj_det, subj_adj, subj_noun)
-        obj = '%s%s %s'%(obj_det, obj_adj, obj_noun)
-        obj2 = '%s%s %s'%(obj2_det, obj2_adj, obj2_noun)
-        obj3 = '%s%s %s'%(obj3_det, obj3_adj, obj3_noun)
-
-        ## Get coordinated subject for ORC, ORRC, PRC and PRRC
-        subj_coord = ''
-        random.shuffle(subj_list)
-        for item in subj_list:
-            if item not in [subj_noun, obj_noun, obj3_noun]:  #we don't include obj2 since it doesn't occur in SRCs
-                subj_coord = item
-                break
-
-        if subj_coord == '': #if you cannot find coordination without repeating, pick the item that is not being coordinated
+            subj_adj = get_adj(subj_class, noun_classes, adj_classes, [])
+            obj_adj = get_adj(obj_class, noun_classes, adj_classes, [subj_adj])
+            obj2_adj = get_adj(obj2_class, noun_classes, adj_classes, [subj_adj, obj_adj])
+            obj3_adj = get_adj(obj3_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj2_adj])   #does this make it more likely that obj3 will not have adjs? 
+            #print(subj, obj, obj2, obj3)
+            stats.lap('adjectives')
+
+
+            nouns_used.add(subj)
+            nouns_used.add(obj)
+            nouns_used.add(obj2)
+            nouns_used.add(obj3)
+
+            if subj_adj != '': 
+                adjs_used.add(str.split(subj_adj)[-1])
+            if obj_adj != '': 
+                adjs_used.add(str.split(obj_adj)[-1])
+            if obj2_adj != '': 
+                adjs_used.add(str.split(obj2_adj)[-1])
+            if obj3_adj != '': 
+                adjs_used.add(str.split(obj3_adj)[-1])
+
+            # drawn among the numbers the "that" control sentences allow (see agreement.py)
+            subj_num, obj_num, obj2_num, obj3_num = item_numbers.draw([subj, obj, obj2, obj3])
+            subj_noun = inflect(subj, subj_num)
+            obj_noun = inflect(obj, obj_num)
+            obj2_noun = inflect(obj2, obj2_num)
+            obj3_noun = inflect(obj3, obj3_num)
+
+            subj = '%s%s %s'%(subj_det, subj_adj, subj_noun)
+            obj = '%s%s %s'%(obj_det, obj_adj, obj_noun)
+            obj2 = '%s%s %s'%(obj2_det, obj2_adj, obj2_noun)
+            obj3 = '%s%s %s'%(obj3_det, obj3_adj, obj3_noun)
+            stats.lap('number')
+
+            ## Get coordinated subject for ORC, ORRC, PRC and PRRC
+            subj_coord = ''
+            random.shuffle(subj_list)
             for item in subj_list:
-                if item not in [subj_noun]:  
+                if item not in [subj_noun, obj_noun, obj3_noun]:  #we don't include obj2 since it doesn't occur in SRCs
                     subj_coord = item
-                    break  
+                    break
 
-        if subj_coord == '':
-            print('DID NOT FIND COORDINATION FOR SUBJECT')
-            #print('DID NOT FIND COORDINATION FOR SUBJECT')
+            if subj_coord == '': #if you cannot find coordination without repeating, pick the item that is not being coordinated
+                for item in subj_list:
+                    if item not in [subj_noun]:  
+                        subj_coord = item
+                        break  
 
+            if subj_coord == '':
+                stats.event('no_subject_coordination', 'DID NOT FIND COORDINATION FOR SUBJECT')
 
 
-        subj_coord_adj = get_adj(subj_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj3_adj])
-        subj_coord_noun, subj_coord_num = pluralize(subj_coord)
 
-        subj_coord = '%s%s %s'%(subj_det, subj_coord_adj, subj_coord_noun)
+            subj_coord_adj = get_adj(subj_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj3_adj])
+            subj_coord_noun = inflect(subj_coord, coord_numbers.draw([subj_coord])[0])
 
-        subj_coord = '%s and %s'%(subj, subj_coord)
+            subj_coord = '%s%s %s'%(subj_det, subj_coord_adj, subj_coord_noun)
 
-        ## Get coordinated object for SRC
-        obj_coord = ''
-        random.shuffle(obj_list)
-        for item in obj_list:
-            if item not in [subj_noun, obj_noun, obj2_noun]:
-                obj_coord = item
-                break
+            subj_coord = '%s and %s'%(subj, subj_coord)
 
-        if obj_coord == '': #if you cannot find coordination without repeating, pick randomly
+            ## Get coordinated object for SRC
+            obj_coord = ''
+            random.shuffle(obj_list)
             for item in obj_list:
-                if item not in [obj_noun]:  
+                if item not in [subj_noun, obj_noun, obj2_noun]:
                     obj_coord = item
-                    break  #anyway its randomly shuffled
+                    break
+
+            if obj_coord == '': #if you cannot find coordination without repeating, pick randomly
+                for item in obj_list:
+                    if item not in [obj_noun]:  
+                        obj_coord = item
+                        break  #anyway its randomly shuffled
         
-        if obj_coord == '':
-            print('DID NOT FIND COORDINATION FOR OBJECT')
+            if obj_coord == '':
+                stats.event('no_object_coordination', 'DID NOT FIND COORDINATION FOR OBJECT')
 
-        obj_coord_adj = get_adj(obj_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj2_adj])
-        obj_coord_noun, obj_coord_num = pluralize(obj_coord)
+            obj_coord_adj = get_adj(obj_class, noun_classes, adj_classes, [subj_adj, obj_adj, obj2_adj])
+            obj_coord_noun = inflect(obj_coord, coord_numbers.draw([obj_coord])[0])
 
-        obj_coord = '%s%s %s'%(subj_det, obj_coord_adj, obj_coord_noun)
-        # if obj == obj_coord:
-        #     print(obj, obj_coord)
-        obj_coord = '%s and %s'%(obj, obj_coord)
+            obj_coord = '%s%s %s'%(subj_det, obj_coord_adj, obj_coord_noun)
+            # if obj == obj_coord:
+            #     print(obj, obj_coord)
+            obj_coord = '%s and %s'%(obj, obj_coord)
+            stats.lap('coordination')
 
 
 
 
-        rc_adv = get_adv(verb, verb_classes, adv_classes, [])
-        subjmv_adv = get_adv(subj_mv, verb_classes, adv_classes, [rc_adv])
-        objmv_adv = get_adv(obj_mv, verb_classes, adv_classes, [rc_adv, subjmv_adv])
+            rc_adv = get_adv(verb, verb_classes, adv_classes, [])
+            subjmv_adv = get_adv(subj_mv, verb_classes, adv_classes, [rc_adv])
+            objmv_adv = get_adv(obj_mv, verb_classes, adv_classes, [rc_adv, subjmv_adv])
 
-        if rc_adv != '':
-            advs_used.add(rc_adv.strip())
-        if subjmv_adv != '':
-            advs_used.add(subjmv_adv.strip())
-        if objmv_adv != '':
-            advs_used.add(objmv_adv.strip())
+            if rc_adv != '':
+                advs_used.add(rc_adv.strip())
+            if subjmv_adv != '':
+                advs_used.add(subjmv_adv.strip())
+            if objmv_adv != '':
+                advs_used.add(objmv_adv.strip())
+            stats.lap('adverbs')
 
-        by_phrases_set = set(verb_classes[verb][3])
-        rel_by_phrases = by_phrases_set.intersection(set(by_phrases))
-        by_phrase = random.choice(list(rel_by_phrases))
+            rel_by_phrases = [b for b in verb_classes[verb][3] if b in by_phrases]  # list, not set, so the order does not depend on the hash seed
+            by_phrase = agree_by_phrase(random.choice(rel_by_phrases), subj_num)
+            stats.lap('by_phrase')
+        
 
-        if str.split(subj)[-1] in plurals.keys():
-            subj_num = 'singular'
-        elif str.split(subj)[-1] in plurals.values():
-            subj_num = 'plural'
-        else:
-            print("DID NOT FIND WORD") 
 
-        if subj_num == 'plural' and by_phrase in ['by himself', 'by herself', 'by itself']:
-            by_phrase = 'by themselves'
-        
+            item = self.record(verb=verb, subj_mv=subj_mv, obj_mv=obj_mv, subj=subj, obj=obj, obj2=obj2, obj3=obj3, rc_adv=rc_adv, subjmv_adv=subjmv_adv, objmv_adv=objmv_adv, by_phrase=by_phrase, obj_coord=obj_coord, subj_coord=subj_coord)
+            if checkpoint is not None:
+                pending.append(item)
+            yield(item)
 
+        if checkpoint is not None:
+            checkpoint.add_items(stage, pending)
 
-        args_list.append({'verb': verb, 'subj_mv': subj_mv, 'obj_mv': obj_mv, 'subj': subj, 'obj': obj, 'obj2': obj2, 'obj3':obj3, 'rc_adv': rc_adv, 'subjmv_adv': subjmv_adv, 'objmv_adv': objmv_adv, 'by_phrase': by_phrase, 'obj_coord': obj_coord, 'subj_coord': subj_coord})
 
-    return((args_list, verbs_used, nouns_used, adjs_used, advs_used))
+# The items of a set as a list, with the words they used: (items, verbs_used, nouns_used, adjs_used,
+# advs_used). A set that was being made when a run stopped is read back from the checkpoint up to the
+# last save and carried on from there.
+def create_set(verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, n, checkpoint=None, stage=None):
+    stream = ItemStream(verb_classes, noun_classes, adj_classes, adv_classes, by_phrases, n, checkpoint, stage)
+    args_list = checkpoint.load_items(stage) if stream.resumed is not None else []
+    args_list.extend(stream)
+    return((args_list, stream.verbs_used, stream.nouns_used, stream.adjs_used, stream.advs_used))
 
 
-def get_adapt_test(nadapt, ntest):
+# these groups are created to make sure every verb has at least one by phrase from each group. 
+by_phrases1 = ['little by little', 'by email', 'by mistake', 'by himself', 'by the end of the day', 'by the river', 'by itself', 'by the artist', 'day by day']
+
+by_phrases2 = ['as time went by', 'by phone', 'by herself', 'by chance','by and large', 'by the lake', 'bit by bit', 'as time went by', 'step by step', 'by the end of the week', 'by the politician']
 
-    # these groups are created to make sure every verb has at least one by phrase from each group. 
-    by_phrases1 = ['little by little', 'by email', 'by mistake', 'by himself', 'by the end of the day', 'by the river', 'by itself', 'by the artist', 'day by day']
-    
-    by_phrases2 = ['as time went by', 'by phone', 'by herself', 'by chance','by and large', 'by the lake', 'bit by bit', 'as time went by', 'step by step', 'by the end of the week', 'by the politician']
 
-    if random.randint(0,1) == 0:
-        adapt_byphrases = by_phrases1
-        test_byphrases = by_phrases2
+def get_byphrases(flip):
+    if flip == 0:
+        return(by_phrases1, by_phrases2)
     else:
-        adapt_byphrases = by_phrases2
-        test_byphrases = by_phrases1
+        return(by_phrases2, by_phrases1)
 
-    ### ADAPT ###
+
+# The classes for the adapt set: about half the nouns, adjectives and adverbs of every class and half
+# the verbs. Returns the verbs left for the test set as well.
+def get_adapt_classes(shuffle=random.shuffle):
     # Get a subset of nouns for adapt
     adapt_noun_classes = {}
 
     for key in all_noun_classes.keys():
-        curr_all_nouns = all_noun_classes[key][0]
-        random.shuffle(curr_all_nouns)
+        curr_all_nouns = list(all_noun_classes[key][0])  # copies, so classes.py is the same at the start of every list
+        shuffle(curr_all_nouns)
         curr_nouns = curr_all_nouns[0:(int(len(curr_all_nouns)/2)+1)]
 
-        adapt_noun_classes[key] = (curr_nouns, all_noun_classes[key][1], all_noun_classes[key][2])
+        adapt_noun_classes[key] = (curr_nouns, list(all_noun_classes[key][1]), list(all_noun_classes[key][2]))
 
     adapt_adj_classes = {}
     for key in adjectives.keys():
-        curr = adjectives[key]
-        random.shuffle(curr)
+        curr = list(adjectives[key])
+        shuffle(curr)
         adapt_adjs = curr[0:int((len(curr)/2))]
         adapt_adj_classes[key] = adapt_adjs
 
     adapt_adv_classes = {}
     for key in adverbs.keys():
-        curr = adverbs[key]
-        random.shuffle(curr)
+        curr = list(adverbs[key])
+        shuffle(curr)
         adapt_advs = curr[0:(int(len(curr)/2))]
         adapt_adv_classes[key] = adapt_advs
 
     # Get a subset of adverbs for adapt. Plus exclude noun classes if they are not in adapt
     adapt_verb_classes = {}
     all_verbs_list = list(all_verbs.keys())
-    random.shuffle(all_verbs.keys())
 
     adapt_verbs = all_verbs_list[0:(int(len(all_verbs_list)/2))]
     test_verbs = all_verbs_list[(int(len(all_verbs_list)/2)):]
 
-    #print(set(adapt_verbs).difference(set(test_verbs)))
-    for word in adapt_verbs:
-        if word in test_verbs:
-            print(word)
-
     #for v in all_verbs.keys():
     for v in adapt_verbs:
         curr_subj_classes = [x for x in all_verbs[v][0] if x in adapt_noun_classes]
         curr_obj_classes = [x for x in all_verbs[v][1] if x in adapt_noun_classes]
 
         if len(curr_subj_classes) > 0 and len(curr_obj_classes) > 0:
-            adapt_verb_classes[v] = (curr_subj_classes, curr_obj_classes, all_verbs[v][2], all_verbs[v][3])
+            adapt_verb_classes[v] = (curr_subj_classes, curr_obj_classes, list(all_verbs[v][2]), all_verbs[v][3])
 
+    return(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs)
 
-    # Get test set
-    adapt_args_list, verbs_used, nouns_used, adjs_used, advs_used = create_set(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases, nadapt)
 
-    ### TEST ###
-    # Get nouns and adjectives not used in adapt
+# The classes for the test set: everything the adapt set did not use
+def get_test_classes(test_verbs, verbs_used, nouns_used, adjs_used, advs_used):
+    # Get nouns and adjectives not used in adapt. These are filtered in lexicon order rather than
+    # taken from set differences so that a list does not depend on the hash seed of the process.
     test_adj_classes = {}
     for key in adjectives.keys():
-        curr = set(adjectives[key])
-        test_adjs = list(curr.difference(adjs_used))
+        test_adjs = [x for x in adjectives[key] if x not in adjs_used]
         test_adj_classes[key] = test_adjs
 
 
     test_adv_classes = {}
     for key in adverbs.keys():
-        curr = set(adverbs[key])
-        test_advs = list(curr.difference(advs_used))
+        test_advs = [x for x in adverbs[key] if x not in advs_used]
         test_adv_classes[key] = test_advs
 
     test_noun_classes = {}
 
     for key in all_noun_classes.keys():
-        curr_all_nouns = set(all_noun_classes[key][0])
-        curr_test_nouns = list(curr_all_nouns.difference(nouns_used))
-        curr_all_verbs = set(all_noun_classes[key][1])
-        curr_test_verbs = list(curr_all_verbs.difference(verbs_used))
+        curr_test_nouns = [x for x in lexicon.class_nouns[key] if x not in nouns_used]
+        curr_test_verbs = [x for x in all_noun_classes[key][1] if x not in verbs_used]
 
         if len(curr_test_verbs) > 0 and len(curr_test_nouns) > 1:
-            test_noun_classes[key] = (curr_test_nouns, curr_test_verbs, all_noun_classes[key][2]) 
+            test_noun_classes[key] = (curr_test_nouns, curr_test_verbs, list(all_noun_classes[key][2]))
 
     # Get verbs and adverbs not used in adapt
     test_verb_classes = {}
     #test_verbs = set(all_verbs.keys()).difference(verbs_used)
 
-    print(len(test_verbs), len(adapt_verbs))
     for v in test_verbs:
         curr_subj_classes = [x for x in all_verbs[v][0] if x in test_noun_classes]
         curr_obj_classes = [x for x in all_verbs[v][1] if x in test_noun_classes]
@@ -862,52 +498,231 @@ def get_adapt_test(nadapt, ntest):
         # curr_test_advs = list(curr_all_advs.difference(advs_used))
 
         if len(curr_subj_classes) > 0 and len(curr_obj_classes) > 0:
-            test_verb_classes[v] = (curr_subj_classes, curr_obj_classes, all_verbs[v][2], all_verbs[v][3])
-            # print(test_verb_classes[v])
-            # print(all_verbs[v])
-            # print('------c')
+            test_verb_classes[v] = (curr_subj_classes, curr_obj_classes, list(all_verbs[v][2]), all_verbs[v][3])
+
+    return(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes)
+
+
+# With a checkpoint, the sets that were already made are read back from it, and a set that was being
+# made is carried on from where it was
+def get_adapt_test(nadapt, ntest, checkpoint=None):
+    if checkpoint is not None and checkpoint.past('adapt_set'):
+        adapt_args_list = checkpoint.load_items('adapt_set')
+        if checkpoint.past('test_set'):
+            return(adapt_args_list, checkpoint.load_items('test_set'))
+        with stats.timer('test_set', ntest):
+            test_args_list, _, _, _, _ = create_set(None, None, None, None, None, ntest, checkpoint, 'test_set')
+        return(adapt_args_list, test_args_list)
+
+    adapt_byphrases, test_byphrases = get_byphrases(random.randint(0,1))
+
+    ### ADAPT ###
+    with stats.timer('lexicon'):
+        adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs = get_adapt_classes()
+
+    # Get adapt set
+    # the by phrases of the test set were drawn before the adapt set
+    if checkpoint is not None and checkpoint.state is not None:
+        test_verbs, test_byphrases = checkpoint.context['test']
+    elif checkpoint is not None:
+        checkpoint.context['test'] = (test_verbs, test_byphrases)
+    with stats.timer('adapt_set', nadapt):
+        adapt_args_list, verbs_used, nouns_used, adjs_used, advs_used = create_set(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases, nadapt, checkpoint, 'adapt_set')
+
+    ### TEST ###
+    with stats.timer('lexicon'):
+        test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes = get_test_classes(test_verbs, verbs_used, nouns_used, adjs_used, advs_used)
     
     #Get test set
-    print("Test")
-    test_args_list, _, _, _, _ = create_set(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases, ntest)
+    with stats.timer('test_set', ntest):
+        test_args_list, _, _, _, _ = create_set(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases, ntest, checkpoint, 'test_set')
     return(adapt_args_list, test_args_list)
 
 
-def make_files(args_list, fname):
-    conds = ['orc', 'orrc', 'ocont', 'prc', 'prrc', 'scont', 'src',
-     'orrc_that', 'prrc_that', 'ocont_that', 'scont_that',
-     'src_by', 'orc_by', 'orrc_by', 'ocont_by', 'scont_by']
-
-    #re-write any old files that exist
-    for cond in conds:
-        curr_fname = '%s_%s.txt'%(fname, cond)
-        f = open(curr_fname, 'w')
-        f.write('sentence, rc_startpos, rc_length, subj_num\n')
-        f.close()
+# The outputs that can be written alongside the txt files: the list as a table (columnar.py) and its
+# sentences as token ids of a vocabulary (tokens.py)
+def open_tables(fname, columnar=False, vocab_file=None):
+    tables = []
+    if columnar:
+        from columnar import ColumnWriter  # these need numpy
+        tables.append(ColumnWriter(fname, conds))
+    if vocab_file is not None:
+        from tokens import TokenWriter
+        tables.append(TokenWriter(fname, conds, vocab_file))
+    return(tables)
+
+
+# args_list is a list of items or an ItemStream, whose items are then written as they are made.
+# With a checkpoint (only for lists), the files are synced and the state saved every checkpoint.every
+# items as the given stage, and a stopped run appends to the files from the last save. The temp files
+# are kept when the stage fails with an exception, so that the next run can append to them; if they
+# are gone anyway, the stage starts again from its first item, with the random state it started with.
+def make_files(args_list, fname, columnar=False, vocab_file=None, checkpoint=None, stage=None):
+    resumed = checkpoint.resume(stage) if checkpoint is not None else None
+    if resumed is not None and resumed['i'] == len(args_list) and not os.path.exists('%s_%s.txt.tmp'%(fname, conds[0])):
+        return(resumed['files'])  # stopped after the files were committed
+
+    #re-write any old files that exist. The old files are only replaced once all the sentences are written
+    writer = ListWriter(fname, conds, 'sentence, rc_startpos, rc_length, subj_num\n', resume=resumed['files'] if resumed else None, keep=checkpoint is not None)
+    if resumed is not None and not writer.resumed:
+        random.setstate(checkpoint.context[stage + '_random'])
+        resumed = None
+    elif checkpoint is not None and resumed is None:
+        checkpoint.context[stage + '_random'] = random.getstate()
+    tables = open_tables(fname, columnar, vocab_file)
+    start = resumed['i'] if resumed else 0
+    try:
+        with writer:
+            for i, args in enumerate(itertools.islice(args_list, start, None), start):
+                if checkpoint is not None and checkpoint.due(i, resumed):
+                    checkpoint.save(stage, i=i, files=writer.sync())
+                stats.mark()
+                sents = create_sents(args)
+                stats.lap('render')
+                for sent in sents.keys():
+                    writer.write(sent, '%s,%s,%s,%s\n'%(sents[sent][0], sents[sent][1], sents[sent][2], sents[sent][3]))
+                    for table in tables:
+                        table.add(sent, i, sents[sent][0], sents[sent][1], sents[sent][2], sents[sent][3], args, sents[sent][4])
+                stats.lap('write')
+            if checkpoint is not None:
+                checkpoint.save(stage, i=len(args_list), files=writer.sync())
+    except:
+        for table in tables:
+            table.abort()
+        raise
+    for table in tables:
+        table.commit()
+    return(writer.report())
+
+
+# Every list gets its own seed, derived from the master seed and the list name. A list therefore comes
+# out the same no matter which process makes it or which other lists are made in the same run.
+def list_seed(seed, name):
+    key = '%s:%s'%(seed, name)
+    return(int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:16], 16))
+
+
+def make_list(task):
+    name, nadapt, ntest, seed, batch, columnar, vocab_file, checkpoint_every, instrument, stream = task
+    if instrument:
+        stats.start()
+    if batch:
+        from sampler import make_list_batch  # needs numpy, which the item by item version does not
+        report = make_list_batch(name, nadapt, ntest, list_seed(seed, name), columnar, vocab_file)
+    elif stream:
+        report = make_list_stream(name, nadapt, ntest, seed, columnar, vocab_file)
+    else:
+        report = make_list_items(name, nadapt, ntest, seed, columnar, vocab_file, checkpoint_every)
+    if instrument:
+        stats.dump('./stats/list%s.json'%(name))
+        stats.stop()
+    return(report)
+
+
+def make_list_items(name, nadapt, ntest, seed, columnar, vocab_file, checkpoint_every):
+    random.seed(list_seed(seed, name))
+
+    checkpoint = None
+    if checkpoint_every:
+        checkpoint = Checkpoint('./adapt/list%s.ckpt'%(name), checkpoint_every, (name, nadapt, ntest, seed))
+    adapt_args, test_args = get_adapt_test(nadapt, ntest, checkpoint)
+    adapt_fname = './adapt/list%s'%(name)
+    if checkpoint is not None and checkpoint.past('adapt_files'):
+        adapt_report = checkpoint.context['adapt_report']
+    else:
+        with stats.timer('adapt_files', len(adapt_args)):
+            adapt_report = make_files(adapt_args, adapt_fname, columnar, vocab_file, checkpoint, 'adapt_files')
+    if checkpoint is not None:
+        checkpoint.context['adapt_report'] = adapt_report
+    test_fname = './test/list%s'%(name)
+    with stats.timer('test_files', len(test_args)):
+        test_report = make_files(test_args, test_fname, columnar, vocab_file, checkpoint, 'test_files')
+    if checkpoint is not None:
+        checkpoint.remove()
+    return(name, adapt_report, test_report)
+
+
+# Same as make_list_items, but every item is written as soon as it is made (see ItemStream) and then
+# dropped, so only the words used are kept. The draws for the items and for their sentences come one after the other,
+# so the lists are not the same as the ones make_list_items makes.
+def make_list_stream(name, nadapt, ntest, seed, columnar, vocab_file):
+    random.seed(list_seed(seed, name))
+    adapt_byphrases, test_byphrases = get_byphrases(random.randint(0,1))
+
+    with stats.timer('lexicon'):
+        adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs = get_adapt_classes()
+    adapt = ItemStream(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases, nadapt, record=dict)
+    with stats.timer('adapt', nadapt):
+        adapt_report = make_files(adapt, './adapt/list%s'%(name), columnar, vocab_file)
+
+    # the adapt set has been written, so its words are all known
+    with stats.timer('lexicon'):
+        test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes = get_test_classes(test_verbs, adapt.verbs_used, adapt.nouns_used, adapt.adjs_used, adapt.advs_used)
+    test = ItemStream(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases, ntest, record=dict)
+    with stats.timer('test', ntest):
+        test_report = make_files(test, './test/list%s'%(name), columnar, vocab_file)
+    return(name, adapt_report, test_report)
+
+
+# batch=True samples the items in batches with numpy (see sampler.py), for very large lists.
+# columnar=True also writes every list as a memory-mappable table (see columnar.py), and with a
+# vocab_file every list is also written as token ids of that vocabulary (see tokens.py); the
+# vocabulary has to have <unk>, and create_lists raises ValueError afterwards if a list has words that
+# are not in it.
+# validate=True checks afterwards that no list's test set has content words of its adapt set and
+# raises ValueError if one does (see test_sets.py); the full overlap report goes to ./overlap.json.
+# checkpoint_every=n saves the state of every list every n items (see checkpoint.py), so that running
+# the same call again after it was stopped carries on where it stopped. Only for the item by item
+# version and the txt files.
+# instrument=True times the stages of making every list and counts retries and failed searches (see
+# instrument.py); the numbers of every list go to ./stats/list<name>.json and are printed at the end.
+# stream=True writes every item as soon as it is made instead of making the whole set first (see
+# make_list_stream), so memory does not grow with the size of the lists. Not with batch or
+# checkpoint_every.
+def create_lists(l, nadapt, ntest, seed=7, workers=1, batch=False, columnar=False, vocab_file=None, validate=False, checkpoint_every=None, instrument=False, stream=False):
+    if checkpoint_every and (batch or columnar or vocab_file is not None):
+        raise ValueError('checkpoints are only made for the txt files of the item by item version')
+    if stream and (batch or checkpoint_every):
+        raise ValueError('stream=True is only for the item by item version without checkpoints')
+    if vocab_file is not None:  # before making any list
+        from tokens import load_vocab, get_unk  # needs numpy
+        get_unk(load_vocab(vocab_file))
+    if not os.path.exists('./adapt/'):
+        os.makedirs('./adapt/')
+    if not os.path.exists('./test/'):
+        os.makedirs('./test/')
+    if instrument and not os.path.exists('./stats/'):
+        os.makedirs('./stats/')
+
+    tasks = [(name, nadapt, ntest, seed, batch, columnar, vocab_file, checkpoint_every, instrument, stream) for name in l]
+    if workers > 1:  # one list per task
+        pool = multiprocessing.Pool(workers)
+        try:
+            reports = pool.map(make_list, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        reports = [make_list(task) for task in tasks]
 
-    #add sentences to files
-    for args in args_list:
-        sents = create_sents(args)
-        #print(len(sents['src']))
-        for sent in sents.keys():
-            curr_fname = '%s_%s.txt'%(fname, sent)
-            f = open(curr_fname, 'a')
-            f.write('%s,%s,%s,%s\n'%(sents[sent][0], sents[sent][1], sents[sent][2], sents[sent][3]))
-            f.close()
+    for name, adapt_report, test_report in reports:
+        print_report('%s (adapt)'%(name), adapt_report)
+        print_report('%s (test)'%(name), test_report)
 
+    if instrument:
+        for name in l:
+            with open('./stats/list%s.json'%(name)) as f:
+                print_stats(name, json.load(f))
 
-def create_lists(l, nadapt, ntest):
-    for i,name in enumerate(l):
-        if not os.path.exists('./adapt/'):
-            os.makedirs('./adapt/')
-        if not os.path.exists('./test/'):
-            os.makedirs('./test/')
+    if vocab_file is not None:
+        from tokens import check_missing
+        missing = check_missing(l)
+        if missing:
+            raise ValueError('words not in %s: %s'%(vocab_file, '; '.join('list %s: %s'%(name, ' '.join(sorted(missing[name]))) for name in l if name in missing)))
 
-        adapt_args, test_args = get_adapt_test(nadapt, ntest)
-        adapt_fname = './adapt/list%s'%(name)
-        make_files(adapt_args, adapt_fname)
-        test_fname = './test/list%s'%(name)
-        make_files(test_args, test_fname)
+    if validate:
+        from test_sets import validate_lists  # needs numpy
+        validate_lists(l, './overlap.json', workers)
 
 
 # lists = ['1','2','3','4','5','6','7','8','9','10']
@@ -919,7 +734,10 @@ def create_lists(l, nadapt, ntest):
 
 #create_lists(['1'], 30000, 30000)
 
-create_lists(['A'], 10000, 10000)
+#create_lists(lists, 10000, 10000, workers=8)
+
+if __name__ == '__main__':
+    create_lists(['A'], 10000, 10000)
 
 
 """
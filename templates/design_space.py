@@ -0,0 +1,288 @@
+import random
+import bisect
+import itertools
+
+from lexicon import lexicon
+from feasibility import FeasibilityIndex
+from agreement import item_numbers
+from agreement import reflexives
+from structures import structures
+from structures import conds
+from structures import compile_slots
+from structures import adv_placement
+
+# Counts and enumerates every item one structure can get from a set of classes (the adapt or test
+# lexicon of a list), without making them. An item is every choice create_set makes for the slots the
+# structure uses: verb and main verb, the three nouns, their determiners, adjectives (with or without a
+# modifier) and number, the adverbs and, for the *_by structures, the by phrase. The coordinated
+# versions are not counted. The three nouns of an item are different, as in create_set, and so are its
+# adjectives and its adverbs. That last part is the exclusion get_adj and get_adv are meant to make,
+# not what they do: they compare the word against the chosen ones with their leading space (' tall'),
+# so they never leave anything out, and create_set can repeat an adjective or adverb within an item.
+# count() and item(k) therefore describe a smaller space than the one create_set samples from.
+#
+# The items are numbered, so space.item(k) gives the k-th one directly: they are grouped in blocks of
+# (verb, subject class, object class, main verb) and each block is a mixed-radix number, so finding an
+# item only takes counting within its block. Sampling without replacement is drawing numbers below
+# space.count() (see sample), and the numbers can be split across workers (see items).
+
+mods = ['extremely', 'quite', 'really', 'rather']
+
+
+# Number of ways to pick one element of every set, no element picked twice. With optional, a set can
+# also be skipped, and every element can be picked in weight ways.
+def count_choices(sets, weight=1, optional=False, taken=()):
+    if not sets:
+        return(1)
+    head, rest = sets[0], sets[1:]
+    if not rest:
+        return((1 if optional else 0) + weight * len([x for x in head if x not in taken]))
+    total = count_choices(rest, weight, optional, taken) if optional else 0
+    for x in head:
+        if x not in taken:
+            total += weight * count_choices(rest, weight, optional, taken + (x,))
+    return(total)
+
+
+# The k-th of those choices: for every set, None if it was skipped, otherwise (element, which of its weight ways)
+def decode_choices(k, sets, weight=1, optional=False, taken=()):
+    if not sets:
+        return([])
+    head, rest = sets[0], sets[1:]
+    if optional:
+        n = count_choices(rest, weight, optional, taken)
+        if k < n:
+            return([None] + decode_choices(k, rest, weight, optional, taken))
+        k -= n
+    for x in head:
+        if x in taken:
+            continue
+        n = count_choices(rest, weight, optional, taken + (x,))
+        if k < weight * n:
+            return([(x, k // n)] + decode_choices(k % n, rest, weight, optional, taken + (x,)))
+        k -= weight * n
+    raise IndexError('choice out of range')
+
+
+def unique(l):
+    seen = set()
+    return([x for x in l if not (x in seen or seen.add(x))])
+
+
+# the determiners get_det can give the object of a verb with this subject
+def det_options(subj_class, obj_class):
+    if obj_class == 'human':
+        return(['my'])
+    elif obj_class == 'achievable':
+        if subj_class == 'antipower':
+            return(['its'])
+        return(['his', 'her'])
+    return(['the'])
+
+
+class DesignSpace(object):
+    def __init__(self, cond, verb_classes, noun_classes, adj_classes, adv_classes, by_phrases):
+        self.cond = cond
+        self.seq = structures[cond][0]
+        self.version = structures[cond][2]
+        # src, scont and their versions use the subject's main verb and obj2, the others the object's and obj3
+        self.subj_side = 'subj_mv' in self.seq
+        self.by = 'by_phrase' in self.seq
+
+        self.nouns = dict((c, list(noun_classes[c][0])) for c in noun_classes)
+        self.adjs = dict((c, unique([a for ac in noun_classes[c][2] for a in adj_classes.get(ac, [])])) for c in noun_classes)
+        self.advs = dict((v, unique([a for ac in verb_classes[v][2] for a in adv_classes.get(ac, [])])) for v in verb_classes)
+        self.objs = dict((v, [c for c in verb_classes[v][1] if c in noun_classes]) for v in verb_classes)
+        self.by_phrases = dict((v, [b for b in verb_classes[v][3] if b in by_phrases]) for v in verb_classes)
+
+        # subject and object number as agreement.item_numbers allows them: not both plural, obj3 always
+        # singular, obj2 either. Nouns whose plural is the same word (mass nouns) are only counted as singular.
+        allowed = [dict(zip(item_numbers.slots, config)) for config in item_numbers.configs if item_numbers.allowed(dict(zip(item_numbers.slots, config)))]
+        self.numbers = unique([(nums['subj'], nums['obj']) for nums in allowed])
+        self.third_numbers = unique([nums['obj2' if self.subj_side else 'obj3'] for nums in allowed])
+        self.countable = dict((c, [x for x in self.nouns[c] if lexicon.plural[x] != x]) for c in self.nouns)
+        self.mass = dict((c, [x for x in self.nouns[c] if lexicon.plural[x] == x]) for c in self.nouns)
+
+        # blocks of (verb, subject class, object class, main verb), for which the other side has a main verb too
+        index = FeasibilityIndex(verb_classes, noun_classes, by_phrases)
+        blocks = set()
+        for v in index.verb_list:
+            sides = [[(c, mv) for c, mvs in index.options[v][side] for mv in mvs if mv != v] for side in [0, 1]]
+            mine, other = (sides[0], sides[1]) if self.subj_side else (sides[1], sides[0])
+            for c, mv in mine:
+                for c2 in unique([c2 for c2, mv2 in other if mv2 != mv]):
+                    if self.subj_side:
+                        blocks.add((v, c, c2, mv))
+                    else:
+                        blocks.add((v, c2, c, mv))
+        self.blocks = sorted(blocks)
+
+        self.cache = {}
+        self.ends = []
+        total = 0
+        for block in self.blocks:
+            total += self.block_count(block)
+            self.ends.append(total)
+        self.total = total
+
+    def third_det_subj(self, subj_class, obj_class):
+        return(subj_class if self.subj_side else obj_class)
+
+    # the nouns of a class that can be plural or the ones that cannot
+    def part(self, c, countable):
+        return(self.countable[c] if countable else self.mass[c])
+
+    # (number, by phrase) combinations of an item whose nouns can (True) or cannot be plural
+    def forms(self, verb, countable):
+        out = []
+        for subj_num, obj_num in self.numbers:
+            if (subj_num == 'plural' and not countable[0]) or (obj_num == 'plural' and not countable[1]):
+                continue
+            for third_num in self.third_numbers:
+                if third_num == 'plural' and not countable[2]:
+                    continue
+                if not self.by:
+                    out.append((subj_num, obj_num, third_num, None))
+                    continue
+                by_phrases = self.by_phrases[verb]
+                if subj_num == 'plural':
+                    by_phrases = unique(['by themselves' if b in reflexives else b for b in by_phrases])
+                for by_phrase in by_phrases:
+                    out.append((subj_num, obj_num, third_num, by_phrase))
+        return(out)
+
+    # For every class of the third noun and whether each noun can be plural: the number of noun
+    # triples and the number of ways to dress one (determiners, adjectives, number, by phrase)
+    def third_classes(self, verb, subj_class, obj_class, mv):
+        key = (verb if self.by else None, subj_class, obj_class, mv)
+        if key not in self.cache:
+            out = []
+            for c in self.objs[mv]:
+                ndets = len(det_options(subj_class, obj_class)) * len(det_options(self.third_det_subj(subj_class, obj_class), c))
+                nadjs = count_choices([self.adjs[subj_class], self.adjs[obj_class], self.adjs[c]], 1 + len(mods), True)
+                for countable in itertools.product([True, False], repeat=3):
+                    parts = [self.part(subj_class, countable[0]), self.part(obj_class, countable[1]), self.part(c, countable[2])]
+                    ntriples = count_choices(parts)
+                    nforms = len(self.forms(verb, countable))
+                    if ntriples and nforms:
+                        out.append((c, countable, ntriples, ndets * nadjs * nforms))
+            self.cache[key] = out
+        return(self.cache[key])
+
+    def nadvs(self, verb, mv):
+        return(count_choices([self.advs[verb], self.advs[mv]], 1, True))
+
+    def block_count(self, block):
+        verb, subj_class, obj_class, mv = block
+        return(sum(ntriples * ndress for _, _, ntriples, ndress in self.third_classes(verb, subj_class, obj_class, mv)) * self.nadvs(verb, mv))
+
+    def count(self):
+        return(self.total)
+
+    # The k-th item, as the phrases of the slots the structure uses (written like create_set writes them)
+    def item(self, k):
+        if k < 0 or k >= self.total:
+            raise IndexError('item %d out of range (%d items)'%(k, self.total))
+        b = bisect.bisect_right(self.ends, k)
+        verb, subj_class, obj_class, mv = self.blocks[b]
+        k -= self.ends[b-1] if b > 0 else 0
+
+        k, advs = divmod(k, self.nadvs(verb, mv))
+        for c, countable, ntriples, ndress in self.third_classes(verb, subj_class, obj_class, mv):
+            if k < ntriples * ndress:
+                break
+            k -= ntriples * ndress
+        k, dress = divmod(k, ndress)
+        parts = [self.part(subj_class, countable[0]), self.part(obj_class, countable[1]), self.part(c, countable[2])]
+        (subj, _), (obj, _), (third, _) = decode_choices(k, parts)
+
+        forms = self.forms(verb, countable)
+        dress, form = divmod(dress, len(forms))
+        subj_num, obj_num, third_num, by_phrase = forms[form]
+        obj_dets = det_options(subj_class, obj_class)
+        third_dets = det_options(self.third_det_subj(subj_class, obj_class), c)
+        dress, det = divmod(dress, len(obj_dets) * len(third_dets))
+        obj_det, third_det = obj_dets[det // len(third_dets)], third_dets[det % len(third_dets)]
+        adjs = decode_choices(dress, [self.adjs[subj_class], self.adjs[obj_class], self.adjs[c]], 1 + len(mods), True)
+        rc_adv, mv_adv = decode_choices(advs, [self.advs[verb], self.advs[mv]], 1, True)
+
+        def noun_phrase(det, adj, noun, num):
+            if adj is not None:
+                a, m = adj
+                det = '%s %s'%(det, a) if m == 0 else '%s %s %s'%(det, mods[m-1], a)
+            return('%s %s'%(det, lexicon.plural[noun] if num == 'plural' else noun))
+
+        def adv(a):
+            return(' %s'%(a[0]) if a is not None else '')
+
+        subj_det = 'my' if subj_class == 'human' else 'the'
+        third_key, mv_key, mv_adv_key = ('obj2', 'subj_mv', 'subjmv_adv') if self.subj_side else ('obj3', 'obj_mv', 'objmv_adv')
+        item = {
+            'verb': verb,
+            'subj': noun_phrase(subj_det, adjs[0], subj, subj_num),
+            'obj': noun_phrase(obj_det, adjs[1], obj, obj_num),
+            third_key: noun_phrase(third_det, adjs[2], third, third_num),
+            mv_key: mv,
+            'rc_adv': adv(rc_adv),
+            mv_adv_key: adv(mv_adv),
+            'was': 'was' if obj_num == 'singular' else 'were',
+        }
+        if self.by:
+            item['by_phrase'] = by_phrase
+
+        # the "that" versions, as create_sents makes them (obj3 is always singular)
+        if self.version > 0:
+            if subj_num == 'singular':
+                item['subj'] = 'that' + item['subj'][len(subj_det):]
+            elif not self.subj_side:
+                item['obj3'] = 'that' + item['obj3'][len(third_det):]
+            elif self.version == 2:
+                item['obj2'] = 'that' + noun_phrase('', adjs[2], third, 'singular')
+        return(item)
+
+    # The sentence of the k-th item, with the adverbs placed as create_sents places them
+    def sentence(self, k):
+        rc_early, mv_early = adv_placement(2)
+        fmt, keys, _, _, _, _ = compile_slots(self.seq, rc_early, mv_early, False)
+        item = self.item(k)
+        return(fmt%tuple(item[key] for key in keys))
+
+    # items start, start+step, ... below stop, made one at a time (step and start split them across workers)
+    def items(self, start=0, stop=None, step=1):
+        stop = self.total if stop is None else min(stop, self.total)
+        for k in range(start, stop, step):
+            yield(self.item(k))
+
+    def __iter__(self):
+        return(self.items())
+
+    # n different items, uniformly
+    def sample(self, n, rng=random):
+        return([self.item(k) for k in rng.sample(range(self.total), n)])
+
+
+# The design spaces of the adapt and test sets of list name, with the same split make_list makes for
+# nadapt adapt items. The test lexicon depends on the words the adapt items used, so the adapt items
+# are generated (but not rendered or written).
+def design_spaces(name, nadapt, seed=7, structs=conds):
+    from create_rcs import list_seed, get_byphrases, get_adapt_classes, get_test_classes, create_set
+    random.seed(list_seed(seed, name))
+    adapt_byphrases, test_byphrases = get_byphrases(random.randint(0,1))
+    adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs = get_adapt_classes()
+    _, verbs_used, nouns_used, adjs_used, advs_used = create_set(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases, nadapt)
+    test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes = get_test_classes(test_verbs, verbs_used, nouns_used, adjs_used, advs_used)
+
+    spaces = {'adapt': {}, 'test': {}}
+    for cond in structs:
+        spaces['adapt'][cond] = DesignSpace(cond, adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases)
+        spaces['test'][cond] = DesignSpace(cond, test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases)
+    return(spaces)
+
+
+if __name__ == '__main__':
+    spaces = design_spaces('A', 10000)
+    for split in ['adapt', 'test']:
+        print(split)
+        for cond in conds:
+            space = spaces[split][cond]
+            print('  %-12s %6d blocks %24d items'%(cond, len(space.blocks), space.count()))
@@ -0,0 +1,106 @@
+import random
+
+from instrument import stats
+
+# For one set of verb/noun classes (the adapt or the test lexicon), every way an RC verb can get a
+# main verb for its subject and for its object: verb -> side (0 subject, 1 object) -> [(noun class, main verbs)].
+# Built once per set. create_set then draws items from it instead of reshuffling every verb and
+# class list and retrying until a combination works.
+#
+# The index also keeps verbs_used (as self.used) and, for every verb and side, how many of its
+# (class, main verb) pairs are still available, so that whether a verb can be used is a lookup.
+class FeasibilityIndex(object):
+    def __init__(self, verb_classes, noun_classes, by_phrases):
+        # A verb can only be the RC verb if it has a by phrase from this set's group: create_set draws
+        # the by phrase of an item with random.choice among them, which fails on a verb that has none
+        self.verb_list = [v for v in verb_classes if any(b in by_phrases for b in verb_classes[v][3])]
+        if not self.verb_list:
+            raise ValueError('no verb has a by phrase of this set (%s)'%(', '.join(by_phrases)))
+
+        self.options = {}
+        self.users = {}  # main verb -> (verb, side) for every pair it appears in
+        self.navail = {}
+        for v in self.verb_list:
+            self.options[v] = []
+            for side in [0, 1]:
+                groups = []
+                for c in verb_classes[v][side]:
+                    mvs = tuple(mv for mv in noun_classes[c][1] if mv in verb_classes)
+                    if mvs and not noun_classes[c][0]:
+                        # pick would give create_set a class it cannot draw the subject or object from
+                        raise ValueError('noun class %s of verb %s has main verbs but no nouns'%(c, v))
+                    if mvs:
+                        groups.append((c, mvs))
+                    for mv in mvs:
+                        self.users.setdefault(mv, []).append((v, side))
+                self.options[v].append(groups)
+                self.navail[(v, side)] = sum(len(mvs) for _, mvs in groups)
+
+        # verb -> the classes of its object, for the nouns that go after the main verbs. The object
+        # class lists are never changed while a set is made, so create_set can copy them from here
+        # instead of deep-copying them from verb_classes for every item.
+        self.object_classes = dict((v, tuple(verb_classes[v][1])) for v in verb_classes)
+
+        self.used = set()
+
+    # all (verb, subject class, subject mv, object class, object mv) combinations, ignoring verbs_used
+    def combinations(self):
+        for v in self.verb_list:
+            for subj_class, subj_mvs in self.options[v][0]:
+                for subj_mv in subj_mvs:
+                    for obj_class, obj_mvs in self.options[v][1]:
+                        for obj_mv in obj_mvs:
+                            yield((v, subj_class, subj_mv, obj_class, obj_mv))
+
+    def count(self):
+        total = 0
+        for v in self.verb_list:
+            total += sum(len(mvs) for _, mvs in self.options[v][0]) * sum(len(mvs) for _, mvs in self.options[v][1])
+        return(total)
+
+    def use(self, verb):
+        if verb in self.used:
+            return
+        self.used.add(verb)
+        for key in self.users.get(verb, []):
+            self.navail[key] -= 1
+
+    def release(self, verb):
+        self.used.remove(verb)
+        for key in self.users.get(verb, []):
+            self.navail[key] += 1
+
+    def feasible(self, verb):
+        return(self.navail[(verb, 0)] > 0 and self.navail[(verb, 1)] > 0)
+
+    # A class with a main verb that has not been used yet, then one of its unused main verbs, both
+    # uniformly (what get_mv did by shuffling the class list and the main verb lists).
+    def pick(self, verb, side):
+        avail = []
+        for c, mvs in self.options[verb][side]:
+            curr = [mv for mv in mvs if mv not in self.used]
+            if curr:
+                avail.append((c, curr))
+        c, mvs = avail[random.randint(0, len(avail)-1)]
+        return(c, mvs[random.randint(0, len(mvs)-1)])
+
+    # Goes through the verbs in random order until one has main verbs for both its subject and
+    # object, like create_set did, but draws the order lazily and checks each verb with a lookup.
+    # A verb that does not work is taken out of verbs_used again, even if an earlier item used it.
+    def draw(self):
+        verbs = self.verb_list
+        nverbs = len(verbs)
+        for i in range(nverbs):
+            j = random.randint(i, nverbs-1)
+            verbs[i], verbs[j] = verbs[j], verbs[i]
+            verb = verbs[i]
+            self.use(verb)
+            if self.feasible(verb):
+                subj_class, subj_mv = self.pick(verb, 0)
+                obj_class, obj_mv = self.pick(verb, 1)
+                self.use(subj_mv)
+                self.use(obj_mv)
+                return(verb, subj_class, subj_mv, obj_class, obj_mv)
+            stats.count('verb_rejected')
+            self.release(verb)
+        raise ValueError('No verb left with main verbs for both its subject and its object')
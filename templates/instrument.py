@@ -0,0 +1,131 @@
+import os
+import json
+import time
+
+# Opt-in counters and timers for generation (create_lists(..., instrument=True)). The code that makes
+# a list calls stats.timer(name) around a stage (or mark and lap within a loop), stats.count(name) for
+# things like retries, and stats.event(name, message) for the things it used to only print. Timers
+# nest: a timer or counter started inside the timer 'adapt_set' is kept as 'adapt_set/<name>'. A timer
+# given the number of items of its stage also gives the throughput in items/s.
+#
+# stats is one object per process, off until start(). While it is off, timer returns a shared object
+# that does nothing, count does nothing and event prints its message as before, so leaving the calls in
+# costs about one method call each.
+
+
+class NullTimer(object):
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return(False)
+
+
+null_timer = NullTimer()
+
+
+class Timer(object):
+    __slots__ = ('stats', 'name', 'items', 'key', 'start')
+
+    def __init__(self, stats, name, items):
+        self.stats = stats
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        stats = self.stats
+        stats.stack.append(self.name)
+        self.key = '/'.join(stats.stack)
+        if self.key not in stats.times:  # so the report lists the stages in the order they started
+            stats.times[self.key] = [0, 0.0, 0]
+        self.start = time.perf_counter()
+        return(self)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        entry = self.stats.times[self.key]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - self.start
+        entry[2] += self.items
+        self.stats.stack.pop()
+        return(False)
+
+
+class Stats(object):
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.stack = []
+        self.times = {}  # key -> [calls, seconds, items]
+        self.counts = {}
+        self.last = 0.0
+
+    def start(self):
+        self.reset()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def timer(self, name, items=0):
+        if not self.enabled:
+            return(null_timer)
+        return(Timer(self, name, items))
+
+    # Laps split the time of a loop body into parts without a with block for each: mark() at the top
+    # and lap(name) after every part, which adds the time since the last mark or lap to timer name.
+    def mark(self):
+        if self.enabled:
+            self.last = time.perf_counter()
+
+    def lap(self, name):
+        if self.enabled:
+            now = time.perf_counter()
+            key = '/'.join(self.stack + [name])
+            entry = self.times.setdefault(key, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += now - self.last
+            self.last = now
+
+    def count(self, name, n=1):
+        if self.enabled:
+            key = '/'.join(self.stack + [name])
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def event(self, name, message, n=1):
+        if self.enabled:
+            self.count(name, n)
+        else:
+            print(message)
+
+    def report(self):
+        timers = {}
+        for key, (calls, seconds, items) in self.times.items():
+            timers[key] = dict(calls=calls, seconds=seconds)
+            if items:
+                timers[key]['items'] = items
+                timers[key]['items_per_second'] = items / seconds if seconds > 0 else None
+        return(dict(timers=timers, counts=dict(self.counts)))
+
+    def dump(self, path):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.report(), f, indent=1)
+        os.replace(path + '.tmp', path)
+
+
+stats = Stats()
+
+
+# The summary table of a report (Stats.report() or a json file written by Stats.dump)
+def print_stats(name, report):
+    print('list %s'%(name))
+    print('  %-36s %8s %10s %10s'%('stage', 'calls', 'seconds', 'items/s'))
+    for key, timer in report['timers'].items():
+        depth = key.count('/')
+        rate = timer.get('items_per_second')
+        print('  %-36s %8d %10.3f %10s'%('  ' * depth + key.split('/')[-1], timer['calls'], timer['seconds'], '%.0f'%(rate) if rate else ''))
+    if report['counts']:
+        print('  %-36s %8s'%('count', ''))
+        for key in sorted(report['counts']):
+            print('  %-36s %8d'%(key, report['counts'][key]))
@@ -0,0 +1,69 @@
+# Compact records for the items made by create_set.
+# Every phrase (noun phrase, verb, adverb, by phrase) is interned once in a phrase table and an item only
+# keeps the ids of its 13 phrases in slots, so a list of a million items does not hold a million dicts
+# with their own copies of the strings.
+
+class PhraseTable(object):
+    def __init__(self):
+        self.ids = {}
+        self.phrases = []
+
+    def intern(self, phrase):
+        i = self.ids.get(phrase)
+        if i is None:
+            i = len(self.phrases)
+            self.ids[phrase] = i
+            self.phrases.append(phrase)
+        return(i)
+
+    def __len__(self):
+        return(len(self.phrases))
+
+
+phrases = PhraseTable()
+
+fields = ('verb', 'subj_mv', 'obj_mv', 'subj', 'obj', 'obj2', 'obj3', 'rc_adv', 'subjmv_adv', 'objmv_adv',
+    'by_phrase', 'obj_coord', 'subj_coord')
+
+
+# Immutable. Reads like the dicts create_set used to return: item['subj'] is the phrase, dict(item)
+# gives all of them. item.ids() gives the interned ids.
+class Item(object):
+    __slots__ = fields
+
+    def __init__(self, **kwargs):
+        for field in fields:
+            object.__setattr__(self, field, phrases.intern(kwargs[field]))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Item is immutable')
+
+    def __getitem__(self, key):
+        return(phrases.phrases[getattr(self, key)])
+
+    def keys(self):
+        return(fields)
+
+    def ids(self):
+        return(tuple(getattr(self, field) for field in fields))
+
+    def __eq__(self, other):
+        return(isinstance(other, Item) and self.ids() == other.ids())
+
+    def __ne__(self, other):
+        return(not self == other)
+
+    def __hash__(self):
+        return(hash(self.ids()))
+
+    def __repr__(self):
+        return('Item(%s)'%(', '.join('%s=%r'%(field, self[field]) for field in fields)))
+
+    # pickled as its phrases, since the ids are only good within one process
+    def __reduce__(self):
+        return(item_from_phrases, (tuple(self[field] for field in fields),))
+
+
+def item_from_phrases(values):
+    return(Item(**dict(zip(fields, values))))
+
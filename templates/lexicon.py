@@ -0,0 +1,47 @@
+from classes import all_noun_classes
+from classes import adjectives
+from classes import adverbs
+from classes import plurals
+
+# Lookup tables over the lexicon in classes.py. These are built once so that create_rcs.py
+# does not have to scan plurals.keys()/plurals.values() for every item.
+class Lexicon(object):
+    def __init__(self, noun_classes, adj_classes, adv_classes, plural_forms):
+        # singular <-> plural
+        self.plural = dict(plural_forms)
+        self.singular = {}
+        for sing, plur in plural_forms.items():
+            if plur not in self.singular:  # same answer as list(plurals.values()).index(plur)
+                self.singular[plur] = sing
+
+        # a word that is its own plural (water, juice, ...) counts as singular
+        self.number = {}
+        for plur in self.singular:
+            self.number[plur] = 'plural'
+        for sing in self.plural:
+            self.number[sing] = 'singular'
+
+        # class -> nouns
+        self.class_nouns = {}
+        for c in noun_classes:
+            self.class_nouns[c] = tuple(noun_classes[c][0])
+
+        self.adj_classes = {}
+        for c in adj_classes:
+            for adj in adj_classes[c]:
+                self.adj_classes[adj] = self.adj_classes.get(adj, ()) + (c,)
+
+        self.adv_classes = {}
+        for c in adv_classes:
+            for adv in adv_classes[c]:
+                self.adv_classes[adv] = self.adv_classes.get(adv, ()) + (c,)
+
+    # number of the head noun of a phrase like 'the rather tall friends'. None if the noun is unknown
+    def get_num(self, phrase):
+        return(self.number.get(str.split(phrase)[-1]))
+
+    def is_time_adv(self, adv):
+        return('time' in self.adv_classes.get(adv.strip(), ()))
+
+
+lexicon = Lexicon(all_noun_classes, adjectives, adverbs, plurals)
@@ -0,0 +1,403 @@
+import itertools
+import numpy as np
+
+from lexicon import lexicon
+from items import phrases
+from items import fields
+from feasibility import FeasibilityIndex
+from structures import structures
+from structures import conds
+from structures import compile_slots
+from structures import compile_spans
+from structures import adv_placement
+from writer import ListWriter
+from instrument import stats
+from agreement import item_numbers
+from agreement import coord_numbers
+from agreement import reflexives
+from create_rcs import get_byphrases
+from create_rcs import get_adapt_classes
+from create_rcs import get_test_classes
+from create_rcs import open_tables
+
+# Batched version of create_set/create_sents for very large lists. All the choices for a batch of items
+# (nouns, number, adjectives, adverbs, by phrases, ...) are drawn at once with a numpy Generator as
+# arrays of phrase ids (see items.phrases), and the sentences are rendered from those arrays.
+#
+# The constraints are the ones create_set has: no noun, adjective or adverb repeated within an item where
+# the lexicon allows it, and the test set only uses words the adapt set did not. The one thing that
+# differs is the choice of main verbs: create_set avoids main verbs used by earlier items (verbs_used),
+# which only makes sense one item at a time, so here verb and main verbs are drawn the way create_set
+# draws them for the first item.
+
+mods = ['extremely', 'quite', 'really', 'rather']
+
+
+# list of lists of ints -> (matrix padded with -1, length of every row)
+def pad(rows):
+    counts = np.array([len(r) for r in rows], dtype=np.int64)
+    width = max([1] + [len(r) for r in rows])
+    mat = np.full((len(rows), width), -1, dtype=np.int64)
+    for i, r in enumerate(rows):
+        mat[i, :len(r)] = r
+    return(mat, counts)
+
+
+# A uniform entry of row rows[i] of table for every i, avoiding the values in exclude (arrays of ids).
+# -1 where no entry was found.
+def draw(rng, table, rows, exclude, tries=30):
+    mat, counts = table
+    out = np.full(len(rows), -1, dtype=np.int64)
+    todo = np.flatnonzero(counts[rows] > 0)
+    for _ in range(tries):
+        if len(todo) == 0:
+            break
+        r = rows[todo]
+        pick = mat[r, (rng.random(len(todo)) * counts[r]).astype(np.int64)]
+        ok = np.ones(len(todo), dtype=bool)
+        for ex in exclude:
+            ok &= pick != ex[todo]
+        out[todo[ok]] = pick[ok]
+        todo = todo[~ok]
+    return(out)
+
+
+# Same through two tables: a uniform entry of outer (a class) and then a uniform entry of that row of
+# inner. Returns both, -1 where nothing was found.
+def draw2(rng, outer, inner, rows, exclude, tries=30):
+    mat, counts = outer
+    out_outer = np.full(len(rows), -1, dtype=np.int64)
+    out_inner = np.full(len(rows), -1, dtype=np.int64)
+    todo = np.flatnonzero(counts[rows] > 0)
+    for _ in range(tries):
+        if len(todo) == 0:
+            break
+        r = rows[todo]
+        c = mat[r, (rng.random(len(todo)) * counts[r]).astype(np.int64)]
+        n = inner[1][c]
+        pick = inner[0][c, (rng.random(len(todo)) * np.maximum(n, 1)).astype(np.int64)]
+        ok = n > 0
+        for ex in exclude:
+            ok &= pick != ex[todo]
+        out_outer[todo[ok]] = c[ok]
+        out_inner[todo[ok]] = pick[ok]
+        todo = todo[~ok]
+    return(out_outer, out_inner)
+
+
+def fill(a, b):
+    return(np.where(a >= 0, a, b))
+
+
+# Index of one adapt or test lexicon (the classes get_adapt_classes/get_test_classes return) as arrays.
+class BatchLexicon(object):
+    def __init__(self, verb_classes, noun_classes, adj_classes, adv_classes, by_phrases):
+        intern = phrases.intern
+
+        self.classes = list(noun_classes.keys())
+        cid = dict((c, i) for i, c in enumerate(self.classes))
+        adj_names = [a for a in adj_classes if adj_classes[a]]
+        aid = dict((a, i) for i, a in enumerate(adj_names))
+        adv_names = [a for a in adv_classes if adv_classes[a]]
+        did = dict((a, i) for i, a in enumerate(adv_names))
+        self.verbs = list(verb_classes.keys())
+        vid = dict((v, i) for i, v in enumerate(self.verbs))
+
+        self.class_nouns = pad([[intern(x) for x in noun_classes[c][0]] for c in self.classes])
+        self.class_adjs = pad([[aid[a] for a in noun_classes[c][2] if a in aid] for c in self.classes])
+        self.adjs = pad([[intern(x) for x in adj_classes[a]] for a in adj_names])
+        self.verb_ids = np.array([intern(v) for v in self.verbs], dtype=np.int64)
+        self.verb_advs = pad([[did[a] for a in verb_classes[v][2] if a in did] for v in self.verbs])
+        self.advs = pad([[intern(x) for x in adv_classes[a]] for a in adv_names])
+        self.verb_objs = pad([[cid[c] for c in verb_classes[v][1] if c in cid] for v in self.verbs])
+        self.verb_bys = pad([[intern(b) for b in verb_classes[v][3] if b in by_phrases] for v in self.verbs])
+        self.mods = np.array([intern(m) for m in mods], dtype=np.int64)
+
+        self.class_ids = cid
+        self.det = dict((d, intern(d)) for d in ['my', 'the', 'its', 'his', 'her'])
+        self.reflexive = np.array([intern(b) for b in reflexives], dtype=np.int64)
+        self.themselves = intern('by themselves')
+
+        nouns = set(x for c in self.classes for x in noun_classes[c][0])
+        plural_ids = dict((intern(x), intern(lexicon.plural.get(x, x))) for x in nouns)
+
+        # (class, main verb) pairs for the subject and object of every verb, with cumulative weights:
+        # uniform class, then uniform main verb, as FeasibilityIndex.pick does
+        index = FeasibilityIndex(verb_classes, noun_classes, by_phrases)
+        feasible, pairs = [], ([], [])
+        for v in index.verb_list:
+            sides = []
+            for side in [0, 1]:
+                groups = [(c, [mv for mv in mvs if mv != v]) for c, mvs in index.options[v][side]]
+                groups = [(c, mvs) for c, mvs in groups if mvs]
+                curr = [(cid[c], vid[mv], 1.0/len(groups)/len(mvs)) for c, mvs in groups for mv in mvs]
+                sides.append(curr)
+            if sides[0] and sides[1]:
+                feasible.append(vid[v])
+                for side in [0, 1]:
+                    pairs[side].append(sides[side])
+        self.feasible = np.array(feasible, dtype=np.int64)
+        self.pairs = []
+        for side in [0, 1]:
+            width = max(len(p) for p in pairs[side])
+            cls = np.full((len(self.verbs), width), -1, dtype=np.int64)
+            mv = np.full((len(self.verbs), width), -1, dtype=np.int64)
+            cum = np.full((len(self.verbs), width), 2.0)
+            for v, p in zip(feasible, pairs[side]):
+                cls[v, :len(p)] = [x[0] for x in p]
+                mv[v, :len(p)] = [x[1] for x in p]
+                cum[v, :len(p)] = np.cumsum([x[2] for x in p])
+            self.pairs.append((cls, mv, cum))
+
+        # lookups by phrase id, for every phrase interned so far
+        self.plural = np.arange(len(phrases), dtype=np.int64)
+        for sing, plur in plural_ids.items():
+            self.plural[sing] = plur
+
+    # NumberSampler.draw for every row of nouns (a list of arrays of ids, one per slot of sampler):
+    # True where the noun is plural
+    def draw_numbers(self, sampler, nouns, rng):
+        configs = np.array([[num == 'plural' for num in config] for config in sampler.configs])
+        patterns = list(itertools.product([False, True], repeat=len(nouns)))
+        cum = np.array([sampler.table(countable) for countable in patterns])
+        pattern = np.zeros(len(nouns[0]), dtype=np.int64)
+        for noun in nouns:
+            pattern = pattern * 2 + (self.plural[noun] != noun)
+        cum = cum[pattern]
+        k = (cum <= rng.random(len(pattern))[:, None] * cum[:, -1:]).sum(axis=1)
+        return(configs[k])
+
+    def pick_pair(self, side, v, rng):
+        cls, mv, cum = self.pairs[side]
+        k = (cum[v] < rng.random(len(v))[:, None]).sum(axis=1)
+        k = np.minimum(k, (cum[v] <= 1.0 + 1e-9).sum(axis=1) - 1)
+        return(cls[v, k], mv[v, k])
+
+    def get_det(self, subj_class, obj_class, rng):
+        det = np.full(len(obj_class), self.det['the'], dtype=np.int64)
+        det[obj_class == self.class_ids.get('human', -2)] = self.det['my']
+        achievable = obj_class == self.class_ids.get('achievable', -2)
+        his_her = np.where(rng.random(len(obj_class)) < 0.5, self.det['his'], self.det['her'])
+        det[achievable] = np.where(subj_class == self.class_ids.get('antipower', -2), self.det['its'], his_her)[achievable]
+        return(det)
+
+    def get_adj(self, cls, exclude, rng):
+        adj = np.full(len(cls), -1, dtype=np.int64)
+        mod = np.full(len(cls), -1, dtype=np.int64)
+        rows = np.flatnonzero(rng.random(len(cls)) < 0.5)
+        _, picked = draw2(rng, self.class_adjs, self.adjs, cls[rows], [ex[rows] for ex in exclude])
+        adj[rows] = picked
+        has_mod = (adj >= 0) & (rng.random(len(cls)) < 0.4)  # 2 out of 5 times also add a modifier to the adjective
+        mod[has_mod] = self.mods[rng.integers(0, len(self.mods), has_mod.sum())]
+        return(adj, mod)
+
+    def get_adv(self, verbs, exclude, rng):
+        adv = np.full(len(verbs), -1, dtype=np.int64)
+        rows = np.flatnonzero(rng.random(len(verbs)) < 0.5)
+        _, picked = draw2(rng, self.verb_advs, self.advs, verbs[rows], [ex[rows] for ex in exclude])
+        adv[rows] = picked
+        return(adv)
+
+    # All the choices for n items, as arrays of phrase ids (-1 for no adjective/adverb/modifier)
+    def sample(self, n, rng):
+        c = {}
+        v = self.feasible[rng.integers(0, len(self.feasible), n)]
+        sc, smv = self.pick_pair(0, v, rng)
+        oc, omv = self.pick_pair(1, v, rng)
+        c['verb'] = self.verb_ids[v]
+        c['subj_mv'] = self.verb_ids[smv]
+        c['obj_mv'] = self.verb_ids[omv]
+
+        subj = draw(rng, self.class_nouns, sc, [])
+        obj = fill(draw(rng, self.class_nouns, oc, [subj]), draw(rng, self.class_nouns, oc, []))
+        c2, obj2 = draw2(rng, self.verb_objs, self.class_nouns, smv, [subj, obj])
+        c2b, obj2b = draw2(rng, self.verb_objs, self.class_nouns, smv, [])
+        c2, obj2 = fill(c2, c2b), fill(obj2, obj2b)
+        c3, obj3 = draw2(rng, self.verb_objs, self.class_nouns, omv, [subj, obj])
+        c3b, obj3b = draw2(rng, self.verb_objs, self.class_nouns, omv, [])
+        c3, obj3 = fill(c3, c3b), fill(obj3, obj3b)
+
+        c['subj_det'] = np.where(sc == self.class_ids.get('human', -2), self.det['my'], self.det['the'])
+        c['obj_det'] = self.get_det(sc, oc, rng)
+        c['obj2_det'] = self.get_det(sc, c2, rng)
+        c['obj3_det'] = self.get_det(oc, c3, rng)
+
+        c['subj_adj'], c['subj_mod'] = self.get_adj(sc, [], rng)
+        c['obj_adj'], c['obj_mod'] = self.get_adj(oc, [c['subj_adj']], rng)
+        c['obj2_adj'], c['obj2_mod'] = self.get_adj(c2, [c['subj_adj'], c['obj_adj']], rng)
+        c['obj3_adj'], c['obj3_mod'] = self.get_adj(c3, [c['subj_adj'], c['obj_adj'], c['obj2_adj']], rng)
+
+        # drawn among the numbers the "that" controls allow (see agreement.py)
+        plural = self.draw_numbers(item_numbers, [subj, obj, obj2, obj3], rng)
+        c['subj'] = np.where(plural[:, 0], self.plural[subj], subj)
+        c['obj'] = np.where(plural[:, 1], self.plural[obj], obj)
+        c['obj2'] = np.where(plural[:, 2], self.plural[obj2], obj2)
+        c['obj3'] = np.where(plural[:, 3], self.plural[obj3], obj3)
+        c['obj2_sing'] = obj2
+
+        # coordinated subject (ORC, ORRC, PRC, PRRC) and object (SRC), both with the subject's determiner
+        sub_coord = draw(rng, self.class_nouns, sc, [subj, obj, obj3])
+        sub_coord = fill(sub_coord, fill(draw(rng, self.class_nouns, sc, [subj]), subj))
+        c['subj_coord_adj'], c['subj_coord_mod'] = self.get_adj(sc, [c['subj_adj'], c['obj_adj'], c['obj3_adj']], rng)
+        c['subj_coord'] = np.where(self.draw_numbers(coord_numbers, [sub_coord], rng)[:, 0], self.plural[sub_coord], sub_coord)
+
+        ob_coord = draw(rng, self.class_nouns, oc, [subj, obj, obj2])
+        ob_coord = fill(ob_coord, fill(draw(rng, self.class_nouns, oc, [obj]), obj))
+        c['obj_coord_adj'], c['obj_coord_mod'] = self.get_adj(oc, [c['subj_adj'], c['obj_adj'], c['obj2_adj']], rng)
+        c['obj_coord'] = np.where(self.draw_numbers(coord_numbers, [ob_coord], rng)[:, 0], self.plural[ob_coord], ob_coord)
+
+        c['rc_adv'] = self.get_adv(v, [], rng)
+        c['subjmv_adv'] = self.get_adv(smv, [c['rc_adv']], rng)
+        c['objmv_adv'] = self.get_adv(omv, [c['rc_adv'], c['subjmv_adv']], rng)
+
+        by_phrase = draw(rng, self.verb_bys, v, [])
+        c['by_phrase'] = np.where(plural[:, 0] & np.isin(by_phrase, self.reflexive), self.themselves, by_phrase)
+        c['nouns'] = (subj, obj, obj2, obj3)
+        return(c)
+
+
+def number_of(ids):
+    table = np.array([lexicon.number.get(p, '') for p in phrases.phrases] + [''], dtype=object)
+    return(table[ids])
+
+
+# Words of a sample that the test set must not use (what create_set returns as verbs_used, nouns_used,
+# adjs_used and advs_used)
+def used_words(c):
+    words = np.array(phrases.phrases + [''], dtype=object)
+    def as_set(*cols):
+        ids = np.unique(np.concatenate(cols))
+        return(set(words[ids[ids >= 0]]))
+    verbs_used = as_set(c['verb'], c['subj_mv'], c['obj_mv'])
+    nouns_used = as_set(*c['nouns'])
+    adjs_used = as_set(c['subj_adj'], c['obj_adj'], c['obj2_adj'], c['obj3_adj'])
+    advs_used = as_set(c['rc_adv'], c['subjmv_adv'], c['objmv_adv'])
+    return(verbs_used, nouns_used, adjs_used, advs_used)
+
+
+# Lines (as make_files writes them) of every condition for a sample, like create_sents does item by item.
+# The rows are also added to every table in tables (see create_rcs.open_tables), numbering the items
+# from begin.
+def render_lines(c, rng, tables=[], begin=0):
+    n = len(c['verb'])
+    words = np.array(phrases.phrases + [''], dtype=object)  # -1 is ''
+    spaced = np.array([' ' + p for p in phrases.phrases] + [''], dtype=object)
+    nwords_of = np.array([len(str.split(p)) for p in phrases.phrases] + [0], dtype=np.int64)
+    num = number_of
+
+    def adjpart(x):
+        return(spaced[c[x + '_mod']] + spaced[c[x + '_adj']])
+
+    def nwords_np(x, noun):
+        return(1 + nwords_of[c[x + '_mod']] + nwords_of[c[x + '_adj']] + nwords_of[noun])
+
+    v, that, nw = {}, {}, {}
+    for x in ['subj', 'obj', 'obj2', 'obj3']:
+        v[x] = words[c[x + '_det']] + adjpart(x) + spaced[c[x]]
+        that[x] = 'that' + adjpart(x) + spaced[c[x]]
+        nw[x] = nwords_np(x, c[x])
+    coord_np = words[c['subj_det']] + adjpart('subj_coord') + spaced[c['subj_coord']]
+    v['subj_coord'] = v['subj'] + ' and ' + coord_np
+    that['subj_coord'] = that['subj'] + ' and ' + coord_np
+    nw['subj_coord'] = nw['subj'] + 1 + nwords_np('subj_coord', c['subj_coord'])
+    coord_np = words[c['subj_det']] + adjpart('obj_coord') + spaced[c['obj_coord']]
+    v['obj_coord'] = v['obj'] + ' and ' + coord_np
+    nw['obj_coord'] = nw['obj'] + 1 + nwords_np('obj_coord', c['obj_coord'])
+    for x in ['verb', 'subj_mv', 'obj_mv', 'by_phrase']:
+        v[x] = words[c[x]]
+        nw[x] = nwords_of[c[x]]
+    for x in ['rc_adv', 'subjmv_adv', 'objmv_adv']:
+        v[x] = spaced[c[x]]
+        nw[x] = nwords_of[c[x]]
+
+    nums = {'subj': num(c['subj']), 'obj': num(c['obj'])}
+    v['was'] = np.where(nums['obj'] == 'singular', 'was', 'were').astype(object)
+    nw['was'] = np.ones(n, dtype=np.int64)
+
+    coord = rng.random(n) <= 0.33
+
+    # which noun gets "that" (see create_sents): 1 subj, 2 obj3. obj3 is always singular (see
+    # agreement.py), so it can take "that" when the subject cannot.
+    that_noun = np.where(num(c['subj']) == 'singular', 1, 2)
+    v1 = dict(v)
+    v1['subj'] = np.where(~coord & (that_noun == 1), that['subj'], v['subj'])
+    v1['subj_coord'] = np.where(coord & (that_noun == 1), that['subj_coord'], v['subj_coord'])
+    v1['obj3'] = np.where(that_noun == 2, that['obj3'], v['obj3'])
+    v2 = dict(v1)
+    that2 = 'that' + adjpart('obj2') + spaced[c['obj2_sing']]
+    v2['obj2'] = np.where(that_noun == 2, that2, v['obj2'])
+    versions = [v, v1, v2]
+
+    #for debugging, as in create_sents
+    adv_pos = 2
+    rc_early, mv_early = adv_placement(adv_pos)
+
+    # the plain items first and then the coordinated ones. Row i is the same item in every condition.
+    lines = dict((cond, []) for cond in conds)
+    for coord_val in [False, True]:
+        idx = np.flatnonzero(coord == coord_val)
+        if len(idx) == 0:
+            continue
+        for cond in conds:
+            seq, num_key, version = structures[cond]
+            fmt, keys, pre_keys, pre_lit, region_keys, region_lit = compile_slots(seq, rc_early, mv_early, coord_val)
+            start = pre_lit + sum([nw[k][idx] for k in pre_keys], np.zeros(len(idx), dtype=np.int64))
+            length = region_lit + sum([nw[k][idx] for k in region_keys], np.zeros(len(idx), dtype=np.int64))
+            cols = [versions[version][k][idx].tolist() for k in keys]
+            cols += [start.tolist(), length.tolist(), nums[num_key][idx].tolist()]
+            line_fmt = fmt + ',%d,%d,%s\n'
+            lines[cond] += [line_fmt % row for row in zip(*cols)]
+            if tables:
+                sentences = [fmt % row for row in zip(*cols[:len(keys)])]
+                lex = dict((field, v[field][idx].tolist()) for field in fields)
+                spans = np.stack([np.full(len(idx), x) if isinstance(x, int) else nw[x][idx] for x in compile_spans(seq, rc_early, mv_early, coord_val)], axis=1).tolist()
+                for table in tables:
+                    table.add_rows(cond, (begin + idx).tolist(), sentences, cols[-3], cols[-2], cols[-1], lex, spans)
+    return(lines)
+
+
+# Samples and writes n items to the files of one list, chunk items at a time so memory stays bounded.
+# Returns the writer's report and the words used.
+def make_files_batch(lex, n, fname, rng, columnar=False, vocab_file=None, chunk=100000):
+    used = [set(), set(), set(), set()]
+    writer = ListWriter(fname, conds, 'sentence, rc_startpos, rc_length, subj_num\n')
+    tables = open_tables(fname, columnar, vocab_file)
+    try:
+        with writer:
+            for begin in range(0, n, chunk):
+                stats.mark()
+                c = lex.sample(min(chunk, n - begin), rng)
+                for s, words in zip(used, used_words(c)):
+                    s.update(words)
+                stats.lap('sample')
+                lines = render_lines(c, rng, tables, begin)
+                stats.lap('render')
+                for cond in conds:
+                    writer.write_rows(cond, lines[cond])
+                stats.lap('write')
+    except:
+        for table in tables:
+            table.abort()
+        raise
+    for table in tables:
+        table.commit()
+    return(writer.report(), used)
+
+
+# Counterpart of make_list in create_rcs.py
+def make_list_batch(name, nadapt, ntest, seed, columnar=False, vocab_file=None):
+    rng = np.random.default_rng(seed)
+    adapt_byphrases, test_byphrases = get_byphrases(rng.integers(0, 2))
+
+    with stats.timer('lexicon'):
+        adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs = get_adapt_classes(rng.shuffle)
+        adapt_lex = BatchLexicon(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases)
+    with stats.timer('adapt_files', nadapt):
+        adapt_report, (verbs_used, nouns_used, adjs_used, advs_used) = make_files_batch(adapt_lex, nadapt, './adapt/list%s'%(name), rng, columnar, vocab_file)
+
+    with stats.timer('lexicon'):
+        test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes = get_test_classes(test_verbs, verbs_used, nouns_used, adjs_used, advs_used)
+        test_lex = BatchLexicon(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases)
+    with stats.timer('test_files', ntest):
+        test_report, _ = make_files_batch(test_lex, ntest, './test/list%s'%(name), rng, columnar, vocab_file)
+    return(name, adapt_report, test_report)
@@ -0,0 +1,142 @@
+import os
+import sys
+import hashlib
+import numpy as np
+
+from structures import conds
+from writer import ListWriter
+from writer import print_report
+from sampler import BatchLexicon
+from sampler import render_lines
+from create_rcs import get_byphrases
+from create_rcs import get_adapt_classes
+from create_rcs import get_test_classes
+
+# Sharded version of the batched sampler (sampler.py), for lists too large for one machine. The items
+# of a list are cut in blocks of block_items, and every block is drawn from its own counter-based
+# generator (Philox): the key is derived from the master seed, the list name and the split (adapt or
+# test), and the block number is the counter. Any block can therefore be made without making the
+# blocks before it, and a shard (a range of blocks) comes out the same on whatever node makes it.
+#
+# The one thing that needs the whole list in sampler.make_list_batch is the test lexicon, which leaves
+# out the words the adapt items used. Here it leaves out every word the adapt lexicon can produce
+# instead, which is what a large adapt set uses anyway, so the test shards do not need the adapt set.
+#
+# Every node makes its shard with make_shard (python shards.py make A 1000000 1000000 3/16), the
+# shards are written to ./adapt/shards/ and ./test/shards/, and merge_shards (python shards.py merge
+# A 16) puts them together into the usual per-condition files. The merged files are the same for any
+# number of shards.
+
+header = 'sentence, rc_startpos, rc_length, subj_num\n'
+block_items = 10000
+
+
+def philox_key(seed, name, split):
+    key = '%s:%s:%s'%(seed, name, split)
+    return(int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:32], 16))
+
+
+# The generator of block b of a split: blocks are 2**128 draws apart, far more than a block takes
+def block_rng(seed, name, split, b):
+    return(np.random.Generator(np.random.Philox(key=philox_key(seed, name, split), counter=[0, 0, b, 0])))
+
+
+# Every word the items of lex can have, as (verbs, nouns, adjectives, adverbs) like sampler.used_words
+def lexicon_words(lex):
+    from items import phrases
+    def as_set(*arrays):
+        ids = np.unique(np.concatenate([np.asarray(a).ravel() for a in arrays]))
+        return(set(phrases.phrases[i] for i in ids[ids >= 0]))
+    verbs = as_set(lex.verb_ids[lex.feasible], lex.verb_ids[lex.pairs[0][1][lex.pairs[0][1] >= 0]], lex.verb_ids[lex.pairs[1][1][lex.pairs[1][1] >= 0]])
+    nouns = as_set(lex.class_nouns[0])
+    adjs = as_set(lex.adjs[0])
+    advs = as_set(lex.advs[0])
+    return(verbs, nouns, adjs, advs)
+
+
+# The adapt and test lexicons of a list. They only depend on the seed and the list name.
+def get_lexicons(name, seed=7):
+    rng = block_rng(seed, name, 'lexicon', 0)
+    adapt_byphrases, test_byphrases = get_byphrases(rng.integers(0, 2))
+    adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, test_verbs = get_adapt_classes(rng.shuffle)
+    adapt_lex = BatchLexicon(adapt_verb_classes, adapt_noun_classes, adapt_adj_classes, adapt_adv_classes, adapt_byphrases)
+    verbs_used, nouns_used, adjs_used, advs_used = lexicon_words(adapt_lex)
+    test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes = get_test_classes(test_verbs, verbs_used, nouns_used, adjs_used, advs_used)
+    test_lex = BatchLexicon(test_verb_classes, test_noun_classes, test_adj_classes, test_adv_classes, test_byphrases)
+    return(adapt_lex, test_lex)
+
+
+# blocks of shard i of nshards, for a split of n items
+def shard_blocks(n, i, nshards):
+    nblocks = (n + block_items - 1) // block_items
+    return(range(i * nblocks // nshards, (i + 1) * nblocks // nshards))
+
+
+def shard_name(split, name, i, nshards):
+    return('./%s/shards/list%s.%dof%d'%(split, name, i, nshards))
+
+
+def write_blocks(lex, n, fname, seed, name, split, blocks):
+    writer = ListWriter(fname, conds, header)
+    with writer:
+        for b in blocks:
+            rng = block_rng(seed, name, split, b)
+            c = lex.sample(min(block_items, n - b * block_items), rng)
+            lines = render_lines(c, rng)
+            for cond in conds:
+                writer.write_rows(cond, lines[cond])
+    return(writer.report())
+
+
+# Makes shard i of nshards of list name: its part of the adapt and of the test set
+def make_shard(name, nadapt, ntest, i, nshards, seed=7):
+    if not 0 <= i < nshards:
+        raise ValueError('shard %d of %d'%(i, nshards))
+    for split in ['adapt', 'test']:
+        if not os.path.exists('./%s/shards/'%(split)):
+            os.makedirs('./%s/shards/'%(split))
+    adapt_lex, test_lex = get_lexicons(name, seed)
+    adapt_report = write_blocks(adapt_lex, nadapt, shard_name('adapt', name, i, nshards), seed, name, 'adapt', shard_blocks(nadapt, i, nshards))
+    test_report = write_blocks(test_lex, ntest, shard_name('test', name, i, nshards), seed, name, 'test', shard_blocks(ntest, i, nshards))
+    return(name, adapt_report, test_report)
+
+
+# Puts the nshards shards of list name together into ./adapt/list<name>_<cond>.txt and
+# ./test/list<name>_<cond>.txt, and removes the shards
+def merge_shards(name, nshards, chunk_rows=100000):
+    paths = ['%s_%s.txt'%(shard_name(split, name, i, nshards), cond) for split in ['adapt', 'test'] for i in range(nshards) for cond in conds]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise ValueError('missing shards: %s'%(' '.join(missing)))
+
+    reports = []
+    for split in ['adapt', 'test']:
+        writer = ListWriter('./%s/list%s'%(split, name), conds, header)
+        with writer:
+            for i in range(nshards):
+                for cond in conds:
+                    with open('%s_%s.txt'%(shard_name(split, name, i, nshards), cond)) as f:
+                        f.readline()
+                        rows = []
+                        for line in f:
+                            rows.append(line)
+                            if len(rows) >= chunk_rows:
+                                writer.write_rows(cond, rows)
+                                rows = []
+                        writer.write_rows(cond, rows)
+        reports.append(writer.report())
+    for path in paths:
+        os.remove(path)
+    return(name, reports[0], reports[1])
+
+
+if __name__ == '__main__':
+    # python shards.py make <list> <nadapt> <ntest> <i>/<n>
+    # python shards.py merge <list> <n>
+    if sys.argv[1] == 'make':
+        i, nshards = [int(x) for x in sys.argv[5].split('/')]
+        name, adapt_report, test_report = make_shard(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), i, nshards)
+    else:
+        name, adapt_report, test_report = merge_shards(sys.argv[2], int(sys.argv[3]))
+    print_report('%s (adapt)'%(name), adapt_report)
+    print_report('%s (test)'%(name), test_report)
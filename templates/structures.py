@@ -0,0 +1,166 @@
+# Every structure is a sequence of slots and literal words.
+#  - Slots are filled from the item (see create_sents). rc_subj and rc_obj are the subject and object of
+#    the embedded clause: subj/obj normally, subj_coord/obj_coord in the coordinated versions.
+#  - rc_adv, subjmv_adv and objmv_adv can go in one of two places. ':early' marks the place used when
+#    the adverb comes first and ':late' the place used when it comes second (adv_pos in create_sents).
+#  - '[' and ']' mark the region whose start and length are written out with the sentence.
+#  - Every slot and literal word is also a span of the sentence, named by the slot (without ':early' or
+#    ':late') or the literal word (see span_names). Every sentence of a structure has the same spans, in
+#    the same order; an adverb that is not there, or not in that place, is a span of 0 words.
+# The last two fields are which noun's number goes with the sentence, and which version of the item
+# to fill the slots from: 0 is the item itself, 1 has 'that' as a determiner and 2 also has it on obj2.
+structures = dict(
+    src = (['subj', '[', 'that', 'rc_adv:early', 'verb', 'rc_obj', 'rc_adv:late', ']', 'subjmv_adv:early', 'subj_mv', 'obj2', 'subjmv_adv:late', '.'], 'subj', 0),
+    orc = (['obj', '[', 'that', 'rc_subj', 'rc_adv:early', 'verb', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    orrc = (['obj', '[', 'rc_subj', 'rc_adv:early', 'verb', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    prc = (['obj', '[', 'that', 'was', 'rc_adv:early', 'verb', 'by', 'rc_subj', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    prrc = (['obj', '[', 'rc_adv:early', 'verb', 'by', 'rc_subj', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    ocont = (['obj', 'rc_adv:early', 'verb', 'rc_subj', 'rc_adv:late', '[', 'and', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    scont = (['subj', 'rc_adv:early', 'verb', 'rc_obj', 'rc_adv:late', '[', 'and', ']', 'subjmv_adv:early', 'subj_mv', 'obj2', 'subjmv_adv:late', '.'], 'subj', 0),
+    src_by = (['subj', '[', 'that', 'rc_adv:early', 'verb', 'rc_obj', 'by_phrase', 'rc_adv:late', ']', 'subjmv_adv:early', 'subj_mv', 'obj2', 'subjmv_adv:late', '.'], 'subj', 0),
+    orc_by = (['obj', '[', 'that', 'rc_subj', 'rc_adv:early', 'verb', 'by_phrase', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    orrc_by = (['obj', '[', 'rc_subj', 'rc_adv:early', 'verb', 'by_phrase', 'rc_adv:late', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    ocont_by = (['obj', 'rc_adv:early', 'verb', 'rc_subj', '[', 'by_phrase', 'rc_adv:late', 'and', ']', 'objmv_adv:early', 'obj_mv', 'obj3', 'objmv_adv:late', '.'], 'obj', 0),
+    scont_by = (['subj', 'rc_adv:early', 'verb', 'rc_obj', '[', 'by_phrase', 'rc_adv:late', 'and', ']', 'subjmv_adv:early', 'subj_mv', 'obj2', 'subjmv_adv:late', '.'], 'subj', 0),
+)
+
+# the "that" controls are the same structures filled from the versions of the item with "that" in them
+structures['orrc_that'] = (structures['orrc'][0], 'obj', 1)
+structures['prrc_that'] = (structures['prrc'][0], 'obj', 1)
+structures['ocont_that'] = (structures['ocont'][0], 'obj', 1)
+structures['scont_that'] = (structures['scont'][0], 'subj', 2)
+
+# order in which create_sents returns the conditions
+conds = ['src', 'orc', 'orrc', 'prc', 'prrc', 'ocont', 'scont',
+    'orrc_that', 'prrc_that', 'ocont_that', 'scont_that',
+    'src_by', 'orc_by', 'orrc_by', 'ocont_by', 'scont_by']
+
+slots = set(['subj', 'obj', 'obj2', 'obj3', 'subj_coord', 'obj_coord', 'verb', 'subj_mv', 'obj_mv', 'was', 'by_phrase',
+    'rc_subj', 'rc_obj', 'rc_adv', 'subjmv_adv', 'objmv_adv'])
+
+# these are either '' or start with a space, so they are attached to the previous word
+adv_slots = set(['rc_adv', 'subjmv_adv', 'objmv_adv'])
+
+
+# Resolves a structure for one placement of the adverbs and for either the plain or the coordinated
+# version. Returns the format string of the sentence, the slots it is filled from, and the slots and
+# number of literal words before and inside the region.
+def compile_slots(seq, rc_early, mv_early, coord):
+    rc_subj = 'subj_coord' if coord else 'subj'
+    rc_obj = 'obj_coord' if coord else 'obj'
+
+    fmt = ''
+    keys = []
+    pre_keys, region_keys = [], []
+    pre_lit, region_lit = 0, 0
+    where = 'pre'
+    for token in seq:
+        if token == '[':
+            where = 'region'
+            continue
+        if token == ']':
+            where = 'post'
+            continue
+
+        if ':' in token:
+            token, place = token.split(':')
+            early = rc_early if token == 'rc_adv' else mv_early
+            if (place == 'early') != early:
+                continue
+        if token == 'rc_subj':
+            token = rc_subj
+        elif token == 'rc_obj':
+            token = rc_obj
+
+        if token in slots:
+            if token in adv_slots or fmt == '':
+                fmt += '%s'
+            else:
+                fmt += ' %s'
+            keys.append(token)
+            if where == 'pre':
+                pre_keys.append(token)
+            elif where == 'region':
+                region_keys.append(token)
+        else:
+            lit = token.replace('%', '%%')
+            fmt += lit if fmt == '' else ' ' + lit
+            if where == 'pre':
+                pre_lit += len(str.split(token))
+            elif where == 'region':
+                region_lit += len(str.split(token))
+
+    return(fmt, keys, pre_keys, pre_lit, region_keys, region_lit)
+
+
+def span_names(seq):
+    return([token.split(':')[0] for token in seq if token not in ['[', ']']])
+
+
+# The length of every span of span_names(seq), for one placement of the adverbs: the slot it is filled
+# from, or the number of words of a literal (0 for an adverb place that is not used)
+def compile_spans(seq, rc_early, mv_early, coord):
+    spans = []
+    for token in seq:
+        if token in ['[', ']']:
+            continue
+        if ':' in token:
+            token, place = token.split(':')
+            early = rc_early if token == 'rc_adv' else mv_early
+            if (place == 'early') != early:
+                spans.append(0)
+                continue
+        if token == 'rc_subj':
+            token = 'subj_coord' if coord else 'subj'
+        elif token == 'rc_obj':
+            token = 'obj_coord' if coord else 'obj'
+        spans.append(token if token in slots else len(str.split(token)))
+    return(spans)
+
+
+# The same as Python expressions for the sentence, region start, region length and span lengths. v is
+# the dict the slots are filled from and n the dict with the number of words in each slot.
+def compile_structure(seq, rc_early, mv_early, coord, v='v', n='n'):
+    fmt, keys, pre_keys, pre_lit, region_keys, region_lit = compile_slots(seq, rc_early, mv_early, coord)
+    sent = '%r %% (%s,)'%(fmt, ', '.join('%s[%r]'%(v, key) for key in keys))
+    start = ' + '.join([str(pre_lit)] + ['%s[%r]'%(n, key) for key in pre_keys])
+    length = ' + '.join([str(region_lit)] + ['%s[%r]'%(n, key) for key in region_keys])
+    spans = '(%s,)'%(', '.join(str(x) if isinstance(x, int) else '%s[%r]'%(n, x) for x in compile_spans(seq, rc_early, mv_early, coord)))
+    return(sent, start, length, spans)
+
+
+def adv_placement(adv_pos):
+    return(adv_pos in [0, 2], adv_pos in [0, 1])
+
+
+# Compiles all the structures into one function per adverb placement and coordination, so that
+# rendering an item is a single call with no interpretation of the templates left.
+def compile_structures(structs):
+    compiled = {}
+    for adv_pos in range(4):
+        rc_early, mv_early = adv_placement(adv_pos)
+        for coord in [False, True]:
+            lines = ['def render_item(versions, n, nums):',
+                '    v0, v1, v2 = versions',
+                '    return({']
+            for cond in conds:
+                seq, num, version = structs[cond]
+                sent, start, length, spans = compile_structure(seq, rc_early, mv_early, coord, v='v%d'%(version))
+                lines.append('        %r: [%s, %s, %s, nums[%r], %s],'%(cond, sent, start, length, num, spans))
+            lines.append('    })')
+            namespace = {}
+            exec('\n'.join(lines), namespace)
+            compiled[(adv_pos, coord)] = namespace['render_item']
+    return(compiled)
+
+
+compiled_structures = compile_structures(structures)
+regions = dict((cond, span_names(structures[cond][0])) for cond in conds)
+
+
+# Fills in every structure for one item. versions holds the slot values of the item and of its "that"
+# versions, nwords the number of words in each slot (the same for every version), and nums the number
+# of subj and obj. Returns cond -> [sentence, region start, region length, number, span lengths], with
+# the span lengths in the order of regions[cond].
+def render(adv_pos, coord, versions, nwords, nums):
+    return(compiled_structures[(adv_pos, coord)](versions, nwords, nums))
@@ -1,37 +1,183 @@
 import os
+import sys
+import re
+import json
+import multiprocessing
+import numpy as np
 
-def flatten(l):
-    if isinstance(l[0], list):
-        #print(l)
-        return([item for sublist in l for item in sublist])
-    else:
-        return(l)
+from classes import all_noun_classes
+from classes import all_verbs
+from classes import adjectives
+from classes import adverbs
+from lexicon import lexicon
+from structures import conds
+from create_rcs import by_phrases1
+from create_rcs import by_phrases2
 
-def get_overlap(x,y):
-    with open(x) as f:
-        f.readline()
-        x_lines = f.read().splitlines()
-        x_words = [str.split(x) for x in x_lines]
-        x_words = set(flatten(x_words))
+# Checks that no content word of a list's adapt set shows up in its test set (and reports the overlap
+# between every other pair of files too).
+#
+# Only the words that can come from a lexical choice count: nouns, verbs, adjectives and adverbs, with
+# the plural of a noun counted as the noun. The words every sentence can have (determiners, 'that',
+# 'was', modifiers, the words of the by phrases, ...) are left out, since adapt and test share those
+# by design; a noun that is also part of a by phrase, like email, is left out with them. Every file
+# is encoded as a bitset over those words, and the overlap of every pair of files is the popcount of
+# the AND of their bitsets.
+
+function_words = ['the', 'my', 'his', 'her', 'its', 'that', 'was', 'were', 'and', '.', 'extremely', 'quite', 'really', 'rather']
+
+
+def content_vocab():
+    words = set()
+    for c in all_noun_classes:
+        words.update(all_noun_classes[c][0])
+        words.update(all_noun_classes[c][1])
+    words.update(all_verbs.keys())
+    for c in adjectives:
+        words.update(adjectives[c])
+    adv_words = {}
+    for c in adverbs:
+        for adv in adverbs[c]:
+            for w in str.split(adv):
+                adv_words.setdefault(w, set()).add(adv)
+    words.update(adv_words.keys())
+    for sing in list(words):
+        if sing in lexicon.plural:
+            words.add(lexicon.plural[sing])
+
+    # words of the by phrases, and words that are part of several adverbs (last week, last month)
+    shared = set(function_words)
+    for b in by_phrases1 + by_phrases2 + ['by themselves'] + [b for v in all_verbs for b in all_verbs[v][3]]:
+        shared.update(str.split(b))
+    shared.update(w for w in adv_words if len(adv_words[w]) > 1)
 
-    with open(y) as f:
+    # the plural of a noun gets the bit of the noun, and is left out with it
+    lemmas = sorted(set(lexicon.singular.get(w, w) for w in words) - shared)
+    ids = dict((w, i) for i, w in enumerate(lemmas))
+    for w in words:
+        if lexicon.singular.get(w, w) in ids:
+            ids[w] = ids[lexicon.singular.get(w, w)]
+    return(ids, lemmas)
+
+
+vocab, lemmas = content_vocab()
+nbytes = (len(lemmas) + 7) // 8
+popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+block_rows = 256
+
+
+# packed bitset of the content words of one file (a list file as make_files writes it)
+def encode(path):
+    bits = np.zeros(nbytes * 8, dtype=np.uint8)
+    with open(path) as f:
         f.readline()
-        y_lines = f.read().splitlines()
-        y_words = [str.split(y) for y in y_lines]
-        y_words = set(flatten(y_words))
+        for line in f:
+            for word in str.split(line.rsplit(',', 3)[0]):
+                i = vocab.get(word)
+                if i is not None:
+                    bits[i] = 1
+    return(np.packbits(bits))
 
-    print(x_words.intersection(y_words))
 
-fnames = os.listdir('./adapt/')
+def decode(bitset):
+    return([lemmas[i] for i in np.flatnonzero(np.unpackbits(bitset)[:len(lemmas)])])
 
-for fname in fnames:
-    print(fname)
-    get_overlap('./adapt/'+fname, './test/'+fname)
-    print('-----------------')
 
+# words in common between every pair of rows of a and b. The AND of every pair is block_rows x len(b)
+# x nbytes bytes at a time, rather than all of a at once.
+def overlap_matrix(a, b, block_rows=block_rows):
+    out = np.zeros((len(a), len(b)), dtype=np.int64)
+    for start in range(0, len(a), block_rows):
+        block = a[start:start + block_rows]
+        out[start:start + len(block)] = popcount[block[:, None, :] & b[None, :, :]].sum(axis=2, dtype=np.int64)
+    return(out)
 
 
+# The list files in the adapt and test directories: (list, cond) -> path
+def find_lists(directory):
+    files = {}
+    pattern = re.compile(r'^list(.+)_(%s)\.txt$'%('|'.join(sorted(conds, key=len, reverse=True))))
+    if os.path.exists(directory):
+        for fname in sorted(os.listdir(directory)):
+            m = pattern.match(fname)
+            if m:
+                files[(m.group(1), m.group(2))] = os.path.join(directory, fname)
+    return(files)
 
 
-#get_overlap('./adapt/10/listA_adapt_ocont.txt', './test/10/listA_test_ocont.txt')
-#get_overlap('test.txt', 'adapt.txt')
\ No newline at end of file
+# Overlap between the adapt and test files of the given lists (all of them by default). Returns a
+# report that can be written as json:
+#   files        the files, in the order of the rows and columns of the matrices
+#   files_matrix content words every file has in common with every other file (only with
+#                files_matrix=True, as it grows with the square of the number of files)
+#   lists        the lists, in the order of the rows and columns of adapt_test
+#   adapt_test   content words the adapt set of one list (all conditions) has in common with the test set of another
+#   leaks        for every list whose adapt and test sets share content words, the words
+def check_overlap(names=None, adapt_dir='./adapt/', test_dir='./test/', workers=1, files_matrix=False):
+    adapt_files = find_lists(adapt_dir)
+    test_files = find_lists(test_dir)
+    if names is None:
+        names = sorted(set(name for name, _ in adapt_files) | set(name for name, _ in test_files))
+    names = [str(name) for name in names]
+    files = [('adapt', name, cond, adapt_files[(name, cond)]) for name in names for cond in conds if (name, cond) in adapt_files]
+    files += [('test', name, cond, test_files[(name, cond)]) for name in names for cond in conds if (name, cond) in test_files]
+
+    paths = [f[3] for f in files]
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        try:
+            bitsets = pool.map(encode, paths, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        bitsets = [encode(path) for path in paths]
+    bitsets = np.array(bitsets, dtype=np.uint8).reshape(len(files), nbytes)
+
+    # one bitset per list and set, the OR of its conditions
+    sets = {}
+    for (split, name, _, _), bitset in zip(files, bitsets):
+        key = (split, name)
+        sets[key] = sets[key] | bitset if key in sets else bitset
+    empty = np.zeros(nbytes, dtype=np.uint8)
+    adapt = np.array([sets.get(('adapt', name), empty) for name in names], dtype=np.uint8).reshape(len(names), nbytes)
+    test = np.array([sets.get(('test', name), empty) for name in names], dtype=np.uint8).reshape(len(names), nbytes)
+    adapt_test = overlap_matrix(adapt, test)
+
+    leaks = {}
+    for i, name in enumerate(names):
+        if adapt_test[i, i] > 0:
+            leaks[name] = decode(adapt[i] & test[i])
+
+    report = dict(
+        files=[dict(set=split, list=name, cond=cond, path=path) for split, name, cond, path in files],
+        lists=names,
+        adapt_test=adapt_test.tolist(),
+        leaks=leaks,
+        vocab_size=len(lemmas),
+    )
+    if files_matrix:
+        report['files_matrix'] = overlap_matrix(bitsets, bitsets).tolist()
+    return(report)
+
+
+# For create_lists: fails if any list's adapt and test sets share content words
+def validate_lists(names, report_file=None, workers=1, files_matrix=False):
+    report = check_overlap(names, workers=workers, files_matrix=files_matrix)
+    if report_file is not None:
+        with open(report_file, 'w') as f:
+            json.dump(report, f)
+    if report['leaks']:
+        raise ValueError('adapt and test sets share words: %s'%('; '.join('list %s: %s'%(name, ' '.join(words)) for name, words in sorted(report['leaks'].items()))))
+    return(report)
+
+
+if __name__ == '__main__':
+    # python test_sets.py [--files] (--files adds files_matrix to the report)
+    report = check_overlap(workers=4, files_matrix='--files' in sys.argv[1:])
+    with open('overlap.json', 'w') as f:
+        json.dump(report, f)
+    for i, name in enumerate(report['lists']):
+        print('list %s: %d words of the adapt set in the test set %s'%(name, report['adapt_test'][i][i], ' '.join(report['leaks'].get(name, []))))
+    print('-----------------')
+    print('written overlap.json')
@@ -0,0 +1,182 @@
+import os
+import json
+import shutil
+import numpy as np
+
+# The sentences of a list as token ids of a language model's vocabulary, so scoring jobs can load them
+# without tokenizing anything. Written to a directory <fname>.ids with, for every condition:
+#   <cond>.ids.bin       int32 token ids of all the sentences, one after the other
+#   <cond>.offsets.bin   int64, nrows+1 offsets into <cond>.ids.bin
+#   <cond>.item.bin      int32 item number of every sentence (as in the txt files and the .cols table)
+#   <cond>.unk.bin       uint8 number of words of every sentence that are not in the vocabulary
+# and meta.json with the vocabulary file, the unknown token and every word that was missing.
+#
+# The vocabulary file has one word per line, the id of a word being its line number (as in the
+# vocabularies of neural-complexity). Sentences are split on spaces, like the rest of the pipeline does.
+# Words missing from the vocabulary are written as its unknown token, so the vocabulary has to have one
+# (<unk>, or the id given as unk_id).
+
+unk_token = '<unk>'
+
+
+def load_vocab(path):
+    vocab = {}
+    with open(path) as f:
+        for line in f:
+            word = line.strip()
+            if word and word not in vocab:
+                vocab[word] = len(vocab)
+    return(vocab)
+
+
+# id of the unknown token of a vocabulary. Raises ValueError if it has none.
+def get_unk(vocab, unk_id=None):
+    if unk_id is not None:
+        if unk_id < 0 or unk_id >= len(vocab):
+            raise ValueError('unk_id %d is not an id of the vocabulary (%d words)'%(unk_id, len(vocab)))
+        return(unk_id)
+    if unk_token not in vocab:
+        raise ValueError('the vocabulary has no %s; give the id of its unknown token as unk_id'%(unk_token))
+    return(vocab[unk_token])
+
+
+class TokenWriter(object):
+    def __init__(self, fname, conds, vocab_file, vocab=None, unk_id=None):
+        self.path = fname + '.ids'
+        self.tmp = self.path + '.tmp'
+        self.conds = list(conds)
+        self.vocab_file = vocab_file
+        self.vocab = vocab if vocab is not None else load_vocab(vocab_file)
+        self.unk = get_unk(self.vocab, unk_id)
+        self.missing = {}
+        self.ntokens = dict((cond, 0) for cond in self.conds)
+        self.nrows = dict((cond, 0) for cond in self.conds)
+
+        if os.path.exists(self.tmp):
+            shutil.rmtree(self.tmp)
+        os.makedirs(self.tmp)
+        self.files = {}
+        for cond in self.conds:
+            for name in ['ids', 'offsets', 'item', 'unk']:
+                self.files[(cond, name)] = open(os.path.join(self.tmp, '%s.%s.bin'%(cond, name)), 'wb')
+            self.files[(cond, 'offsets')].write(np.zeros(1, dtype='<i8').tobytes())
+
+    def add(self, cond, item, sentence, start, length, num, lex, spans=None):
+        self.add_rows(cond, [item], [sentence], [start], [length], [num], lex)
+
+    # same arguments as columnar.ColumnWriter.add_rows; only the items and sentences are used
+    def add_rows(self, cond, items, sentences, starts, lengths, num_list, lex, spans=None):
+        vocab = self.vocab
+        ids, lens, unks = [], [], []
+        for sentence in sentences:
+            words = str.split(sentence, ' ')
+            curr = [vocab.get(w, -2) for w in words]
+            nunk = curr.count(-2)
+            if nunk:
+                for w in words:
+                    if w not in vocab:
+                        self.missing[w] = self.missing.get(w, 0) + 1
+                curr = [self.unk if i == -2 else i for i in curr]
+            ids += curr
+            lens.append(len(curr))
+            unks.append(min(nunk, 255))
+        self.files[(cond, 'ids')].write(np.asarray(ids, dtype='<i4').tobytes())
+        self.files[(cond, 'offsets')].write((self.ntokens[cond] + np.cumsum(lens, dtype=np.int64)).astype('<i8').tobytes())
+        self.files[(cond, 'item')].write(np.asarray(items, dtype='<i4').tobytes())
+        self.files[(cond, 'unk')].write(np.asarray(unks, dtype='<u1').tobytes())
+        self.ntokens[cond] += len(ids)
+        self.nrows[cond] += len(sentences)
+
+    def close_files(self):
+        for key in self.files:
+            self.files[key].flush()
+            os.fsync(self.files[key].fileno())
+            self.files[key].close()
+        self.files = {}
+        meta = dict(vocab_file=self.vocab_file, unk=self.unk, conds=self.conds, nrows=self.nrows, missing=self.missing)
+        with open(os.path.join(self.tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1, sort_keys=True)
+
+    # the words that were not in the vocabulary stay in meta.json, for check_missing
+    def commit(self):
+        self.close_files()
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.tmp, self.path)
+        if self.missing:
+            print('%s: %d words not in %s: %s'%(self.path, len(self.missing), self.vocab_file, ' '.join(sorted(self.missing))))
+
+    def abort(self):
+        for key in list(self.files.keys()):
+            self.files[key].close()
+        self.files = {}
+        if os.path.exists(self.tmp):
+            shutil.rmtree(self.tmp)
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return(False)
+
+
+# Token ids written by TokenWriter, memory-mapped
+class TokenTable(object):
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.conds = self.meta['conds']
+        self.missing = self.meta['missing']
+        self.arrays = {}
+        dtypes = dict(ids='<i4', offsets='<i8', item='<i4', unk='<u1')
+        for cond in self.conds:
+            for name, dtype in dtypes.items():
+                fname = os.path.join(path, '%s.%s.bin'%(cond, name))
+                if os.path.getsize(fname) == 0:
+                    self.arrays[(cond, name)] = np.zeros(0, dtype=dtype)
+                else:
+                    self.arrays[(cond, name)] = np.memmap(fname, dtype=dtype, mode='r')
+
+    def __getitem__(self, key):
+        return(self.arrays[key])
+
+    # token ids of sentence i of a condition
+    def sentence(self, cond, i):
+        offsets = self.arrays[(cond, 'offsets')]
+        return(self.arrays[(cond, 'ids')][offsets[i]:offsets[i+1]])
+
+    # item numbers with an unknown word in any condition
+    def unk_items(self):
+        items = [self.arrays[(cond, 'item')][self.arrays[(cond, 'unk')] > 0] for cond in self.conds]
+        return(np.unique(np.concatenate(items)))
+
+
+# The words missing from the vocabulary in the token ids of the lists, as list name -> {word: count}
+# for the lists that have any. create_lists raises ValueError on them, as it does for overlapping
+# words with validate=True, so that no scoring job is run on sentences with unknown words.
+def check_missing(names):
+    missing = {}
+    for name in names:
+        for split in ['adapt', 'test']:
+            with open('./%s/list%s.ids/meta.json'%(split, name)) as f:
+                for word, count in json.load(f)['missing'].items():
+                    missing.setdefault(name, {})
+                    missing[name][word] = missing[name].get(word, 0) + count
+    return(missing)
+
+
+# The same for a list that has already been written: reads <fname>_<cond>.txt
+def export_list(fname, conds, vocab_file, unk_id=None):
+    writer = TokenWriter(fname, conds, vocab_file, unk_id=unk_id)
+    with writer:
+        for cond in conds:
+            with open('%s_%s.txt'%(fname, cond)) as f:
+                f.readline()
+                sentences = [line.rsplit(',', 3)[0] for line in f.read().splitlines()]
+            writer.add_rows(cond, range(len(sentences)), sentences, None, None, None, None)
+    return(writer)
@@ -0,0 +1,111 @@
+import os
+
+# Writes the rows of one list to its per-condition files (<fname>_<cond>.txt).
+# Every condition keeps one open, buffered handle and rows are written in batches. Everything goes to
+# <file>.tmp first and the temp files are only renamed over the real ones in commit(), so a run that
+# crashes halfway never leaves half-written lists behind.
+#
+# resume takes a report() returned by sync(): the temp files are cut back to what had been written at
+# that point and appended to, instead of started again (see checkpoint.py). If any of the temp files
+# is gone, they are all started again and self.resumed is False, so the caller has to start from the
+# first row. keep=True leaves the temp files in place when the with block fails, for a checkpoint to
+# resume from.
+class ListWriter(object):
+    def __init__(self, fname, conds, header='', batch_rows=1000, buffer_size=1<<20, resume=None, keep=False):
+        self.conds = list(conds)
+        self.paths = dict((cond, '%s_%s.txt'%(fname, cond)) for cond in self.conds)
+        self.batch_rows = batch_rows
+        self.pending = dict((cond, []) for cond in self.conds)
+        self.rows = dict((cond, 0) for cond in self.conds)
+        self.nbytes = dict((cond, 0) for cond in self.conds)
+        self.header = header
+        self.keep = keep
+        if resume is not None and not all(os.path.exists(self.paths[cond] + '.tmp') for cond in self.conds):
+            resume = None
+        self.resumed = resume is not None
+        self.files = {}
+        for cond in self.conds:
+            if resume is not None:
+                self.rows[cond], self.nbytes[cond] = resume[cond]
+                with open(self.paths[cond] + '.tmp', 'r+b') as f:
+                    f.truncate(self.nbytes[cond])
+                self.files[cond] = open(self.paths[cond] + '.tmp', 'a', buffering=buffer_size)
+                continue
+            self.files[cond] = open(self.paths[cond] + '.tmp', 'w', buffering=buffer_size)
+            if header:
+                self.files[cond].write(header)
+                self.nbytes[cond] += len(header.encode('utf-8'))
+
+    def write(self, cond, line):
+        pending = self.pending[cond]
+        pending.append(line)
+        self.rows[cond] += 1
+        self.nbytes[cond] += len(line.encode('utf-8'))
+        if len(pending) >= self.batch_rows:
+            self.flush(cond)
+
+    # many rows at once, for callers that already have a whole batch of lines
+    def write_rows(self, cond, lines):
+        self.flush(cond)
+        data = ''.join(lines)
+        self.files[cond].write(data)
+        self.rows[cond] += len(lines)
+        self.nbytes[cond] += len(data.encode('utf-8'))
+
+    def flush(self, cond):
+        if self.pending[cond]:
+            self.files[cond].write(''.join(self.pending[cond]))
+            self.pending[cond] = []
+
+    # writes everything out to disk and returns the report of what is there
+    def sync(self):
+        for cond in self.conds:
+            self.flush(cond)
+            self.files[cond].flush()
+            os.fsync(self.files[cond].fileno())
+        return(self.report())
+
+    def close_files(self):
+        for cond in self.conds:
+            self.flush(cond)
+            self.files[cond].flush()
+            os.fsync(self.files[cond].fileno())
+            self.files[cond].close()
+        self.files = {}
+
+    def commit(self):
+        self.close_files()
+        for cond in self.conds:
+            os.replace(self.paths[cond] + '.tmp', self.paths[cond])
+
+    # drop everything written so far, leaving any old files untouched (and the temp files, with keep)
+    def abort(self):
+        for cond in list(self.files.keys()):
+            self.files[cond].close()
+        self.files = {}
+        if self.keep:
+            return
+        for cond in self.conds:
+            if os.path.exists(self.paths[cond] + '.tmp'):
+                os.remove(self.paths[cond] + '.tmp')
+
+    # cond -> (rows, bytes) written, header included in the bytes
+    def report(self):
+        return(dict((cond, (self.rows[cond], self.nbytes[cond])) for cond in self.conds))
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return(False)
+
+
+def print_report(name, report):
+    print('list %s'%(name))
+    for cond in sorted(report.keys()):
+        rows, nbytes = report[cond]
+        print('  %-12s %8d rows %10d bytes'%(cond, rows, nbytes))
@@ -0,0 +1,67 @@
+import os
+import sys
+import glob
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'templates'))
+
+import create_rcs
+
+# A run with checkpoints that fails with an exception while writing the files has to be resumable,
+# and give the same files as a run that never failed.
+
+nadapt = 600
+ntest = 300
+
+
+def read_lists(directory):
+    out = {}
+    for path in sorted(glob.glob(os.path.join(str(directory), '*', 'list*.txt'))):
+        with open(path) as f:
+            out[os.path.relpath(path, str(directory))] = f.read()
+    return(out)
+
+
+def fail_at(monkeypatch, n):
+    create_sents = create_rcs.create_sents
+    calls = [0]
+    def failing(args):
+        calls[0] += 1
+        if calls[0] == n:
+            raise RuntimeError('stopped at item %d'%(n))
+        return(create_sents(args))
+    monkeypatch.setattr(create_rcs, 'create_sents', failing)
+
+
+@pytest.fixture
+def expected(tmp_path_factory, monkeypatch):
+    directory = tmp_path_factory.mktemp('uninterrupted')
+    monkeypatch.chdir(directory)
+    create_rcs.create_lists(['A'], nadapt, ntest)
+    return(read_lists(directory))
+
+
+@pytest.mark.parametrize('n', [480, nadapt + 120])
+def test_resume_after_exception(tmp_path, monkeypatch, expected, n):
+    monkeypatch.chdir(tmp_path)
+    with monkeypatch.context() as m:
+        fail_at(m, n)
+        with pytest.raises(RuntimeError):
+            create_rcs.create_lists(['A'], nadapt, ntest, checkpoint_every=50)
+    assert glob.glob('./*/listA_*.txt.tmp')
+    create_rcs.create_lists(['A'], nadapt, ntest, checkpoint_every=50)
+    assert read_lists(tmp_path) == expected
+    assert not glob.glob('./adapt/listA.ckpt*')
+
+
+def test_resume_without_temp_files(tmp_path, monkeypatch, expected):
+    monkeypatch.chdir(tmp_path)
+    with monkeypatch.context() as m:
+        fail_at(m, 480)
+        with pytest.raises(RuntimeError):
+            create_rcs.create_lists(['A'], nadapt, ntest, checkpoint_every=50)
+    for path in glob.glob('./*/listA_*.txt.tmp'):
+        os.remove(path)
+    create_rcs.create_lists(['A'], nadapt, ntest, checkpoint_every=50)
+    assert read_lists(tmp_path) == expected